@@ -9,9 +9,20 @@
 #
 ################################################################################
 
+# The figures are rendered through figtools (in parallel, incrementally and
+# loading each figure on demand), so the script stops here when it is run.
+if __name__ == "__main__":
+
+    import os, sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+    from figtools.cli import main
+    sys.exit(main(__file__))
+
 # LIBRARIES
 from pyx import *
 from math import *
+from figtools import canvas    # The PyX canvas, coalescing the strokes of each figure
+from figtools.tiling import Substitution, dots, lattice, subdivide
 from itertools import product
 
 # CONSTANTS
@@ -6220,15 +6231,10 @@ def figure000f():
     eps = 0.02
     dX  = (1.0/N , -1.0/N)
     dY  = (1.0/N ,  1.0/N)
-    for i in range(1,N*20):
-        for j in range(1,N*20):
-            P = (-2*X + i*dX[0] + j*dY[0], 0 + i*dX[1] + j*dY[1])
-            if (2*P[0]+P[1] < (2-eps)*X and
-                P[0]+2*P[1] > (1+eps)*X and
-               -2*P[0]+P[1] < -eps*X):
-                drawing.append((path.path(
-                    path.moveto(*P),
-                    path.closepath()), BASE+THIN+COLOR(BLACK)))
+    P   = lattice((-2*X, 0), dX, dY, N*20, [( 2, 1, (2-eps)*X),
+                                            (-1,-2,-(1+eps)*X),
+                                            (-2, 1, -eps*X)])
+    drawing.extend((dot, BASE+THIN+COLOR(BLACK)) for dot in dots(P))
 
     drawing.append((path.path(path.moveto(*A),
                               path.lineto(*F),
@@ -8526,19 +8532,16 @@ def figure006g():
 
     name = "figures/figure006g"
 
-    def pinwheel(A, B, C, depth):
-        output = [(A, B, C, depth)]
-        if depth > 0:
-            D = w_point(B,C, 4,1)
-            E = w_point(D,C, 1,1)
-            F = w_point(A,C, 1,1)
-            G = w_point(A,D, 1,1)
-            output.extend(pinwheel(D,B,A,depth-1))
-            output.extend(pinwheel(E,F,D,depth-1))
-            output.extend(pinwheel(G,D,F,depth-1))
-            output.extend(pinwheel(G,A,F,depth-1))
-            output.extend(pinwheel(E,F,C,depth-1))
-        return output
+    def pinwheel(A, B, C):
+        D = w_point(B,C, 4,1)
+        E = w_point(D,C, 1,1)
+        F = w_point(A,C, 1,1)
+        G = w_point(A,D, 1,1)
+        return [(D,B,A),
+                (E,F,D),
+                (G,D,F),
+                (G,A,F),
+                (E,F,C)]
 
 
     X = 1.0 # Scale #
@@ -8547,15 +8550,12 @@ def figure006g():
     C = (8*X,   0)
     S = [ULTRATHIN, VERYTHIN, VERYTHICK, VERYTHICK]
 
-    drawing = []
-    for P,Q,R,s in pinwheel(A, B, C, 3):
-        drawing.append((path.path(path.moveto(*P),
-                                  path.lineto(*Q),
-                                  path.lineto(*R),
-                                  path.closepath()), BASE+S[s]))
-
     mycanvas = canvas.canvas()
-    for (p, s) in drawing: mycanvas.stroke(p, s)
+    mycanvas.stream(lambda: ((path.path(path.moveto(*P),
+                                        path.lineto(*Q),
+                                        path.lineto(*R),
+                                        path.closepath()), BASE+S[s])
+                             for (P,Q,R),s in subdivide((A, B, C), pinwheel, 3)))
     mycanvas.writePDFfile(name)
 
 
@@ -8564,18 +8564,15 @@ def figure006h():
 
     name = "figures/figure006h"
 
-    def pinwheel(A, B, C, depth):
-        output = [(A, B, C, depth)]
-        if depth > 0:
-            D = w_point(B,C, 4,1)
-            E = w_point(D,C, 1,1)
-            F = w_point(A,C, 1,1)
-            G = w_point(A,D, 1,1)
-            output.extend(pinwheel(D,B,A,depth-1))
-            output.extend(pinwheel(E,F,D,depth-1))
-            output.extend(pinwheel(G,A,F,depth-1))
-            output.extend(pinwheel(E,F,C,depth-1))
-        return output
+    def pinwheel(A, B, C):
+        D = w_point(B,C, 4,1)
+        E = w_point(D,C, 1,1)
+        F = w_point(A,C, 1,1)
+        G = w_point(A,D, 1,1)
+        return [(D,B,A),
+                (E,F,D),
+                (G,A,F),
+                (E,F,C)]
 
 
     X = 1.0 # Scale #
@@ -8584,15 +8581,12 @@ def figure006h():
     C = (8*X,   0)
     S = [ULTRATHIN+DOTTED, ULTRATHIN, VERYTHIN, THIN, NORMAL, THICK]
 
-    drawing = []
-    for P,Q,R,s in pinwheel(A, B, C, 5):
-        drawing.append((path.path(path.moveto(*P),
-                                  path.lineto(*Q),
-                                  path.lineto(*R),
-                                  path.closepath()), BASE+S[s]))
-
     mycanvas = canvas.canvas()
-    for (p, s) in drawing: mycanvas.stroke(p, s)
+    mycanvas.stream(lambda: ((path.path(path.moveto(*P),
+                                        path.lineto(*Q),
+                                        path.lineto(*R),
+                                        path.closepath()), BASE+S[s])
+                             for (P,Q,R),s in subdivide((A, B, C), pinwheel, 5)))
     mycanvas.writePDFfile(name)
 
 
@@ -8705,16 +8699,12 @@ def figure006k():
     B   = (             0, 1*(PHI+1.0)*X)
     C   = ( 2*(PHI+1.0)*X,             0)
 
-    def koch(A, B, C, depth):
-        if depth == 0: yield (A,B,C) 
-        else:
-            D = w_point(B,C, 1,1)
-            E = w_point(A,C, 5,3)
-            yield from koch(D,E,B,depth-1)
-            yield from koch(D,E,C,depth-1)
+    koch = Substitution({"D": ("B","C", 1,1), "E": ("A","C", 5,3)}, ["DEB", "DEC"])
+
+    tiles = koch.expand((A,B,C), 8)
 
     drawing = []
-    for P,Q,R in koch(A,B,C, 8):
+    for P,Q,R in tiles.tolist():
         drawing.append((path.path(path.moveto(*P),
                                   path.lineto(*Q),
                                   path.lineto(*R),
@@ -8741,16 +8731,12 @@ def figure006l():
     B   = (             0, 1*(PHI+1.0)*X)
     C   = ( 2*(PHI+1.0)*X,             0)
 
-    def koch_2(A, B, C, depth):
-        if depth == 0: yield (A,B,C) 
-        else:
-            D = w_point(B,C, 3,2)
-            E = w_point(A,C, 3,1)
-            yield from koch_2(A,E,B,depth-1)
-            yield from koch_2(D,E,C,depth-1)
+    koch_2 = Substitution({"D": ("B","C", 3,2), "E": ("A","C", 3,1)}, ["AEB", "DEC"])
+
+    tiles = koch_2.expand((A,B,C), 10)
 
     drawing = []
-    for P,Q,R in koch_2(A,B,C, 10):
+    for P,Q,R in tiles.tolist():
         drawing.append((path.path(path.moveto(*P),
                                   path.lineto(*Q),
                                   path.lineto(*R),
@@ -21378,533 +21364,3 @@ def figure023f():
 
 
 ################################################################################
-
-if __name__ == "__main__":
-
-    figure000a()
-    figure000b()
-    figure000c()
-    figure000d()
-    figure000e()
-    figure000f()
-    figure001a()
-    figure001aa()
-    figure001b()
-    figure001c()
-    figure001d()
-    figure001e()
-    figure001f()
-    figure001g()
-    figure001h()
-    figure002a()
-    figure002b()
-    figure002c()
-    figure002d()
-    figure002e()
-    figure002f()
-    figure002g()
-    figure002h()
-    figure002i()
-    figure002j()
-    figure002k()
-    figure003a()
-    figure003b()
-    figure003c()
-    figure004a()
-    figure004b()
-    figure004c()
-    figure004d()
-    figure004e()
-    figure004f()
-    figure004g()
-    figure004h()
-    figure004i()
-    figure004j()
-    figure004k()
-    figure004l()
-    figure004m()
-    figure004n()
-    figure004o()
-    figure004p()
-    figure004q()
-    figure004r()
-    figure004s()
-    figure005a()
-    figure005b()
-    figure005c()
-    figure005d()
-    figure005e()
-    figure005f()
-    figure005g()
-    figure006a()
-    figure006b()
-    figure006c()
-    figure006d()
-    figure006e()
-    figure006f()
-    figure006g()
-    figure006h()
-    figure006i()
-    figure006j()
-    figure006k()
-    figure006l()
-    figure007a()
-    figure007b()
-    figure008ag()
-    figure008bg()
-    figure008cg()
-    figure008dg()
-    figure008eg()
-    figure008fg()
-    figure008gg()
-    figure008ak()
-    figure008bk()
-    figure008ck()
-    figure008dk()
-    figure008ek()
-    figure008fk()
-    figure008gk()
-    figure008ab()
-    figure008bb()
-    figure008cb()
-    figure008db()
-    figure008eb()
-    figure008fb()
-    figure008gb()
-    figure008ay()
-    figure008by()
-    figure008cy()
-    figure008dy()
-    figure008ey()
-    figure008fy()
-    figure008gy()
-    figure009()
-    figure009b()
-    figure009c()
-    figure009d()
-    figure009e()
-    figure009f()
-    figure009g()
-    figure009h()
-    figure009i()
-    figure009j()
-    figure010a()
-    figure010b()
-    figure010c()
-    figure010d()
-    figure010e()
-    figure010f()
-    figure010g()
-    figure010h()
-    figure010i()
-    figure010j()
-    figure010k()
-    figure010l()
-    figure010m()
-    figure010n()
-    figure010o()
-    figure011a()
-    figure011b()
-    figure011c()
-    figure012a()
-    figure012b()
-    figure012c()
-    figure012d()
-    figure012e()
-    figure012f()
-    figure012g()
-    figure012h()
-    figure012i()
-    figure012j()
-    figure012k()
-    figure012l()
-    figure012m()
-    figure012n()
-    figure012o()
-    figure012p()
-    figure012q()
-    figure012r()
-    figure012s()
-    figure012t()
-    figure012u()
-    figure012v()
-    figure012w()
-    figure012x()
-    figure012y()
-    figure012z()
-    figure012aa()
-    figure012ab()
-    figure012ac()
-    figure012ad()
-    figure012ae()
-    figure012af()
-    figure013a()
-    figure013b()
-    figure013c()
-    figure013d()
-    figure013e()
-    figure013f()
-    figure013g()
-    figure013h()
-    figure013i()
-    figure013j()
-    figure013k()
-    figure013l()
-    figure013m()
-    figure013n()
-    figure013o()
-    figure013p()
-    figure013q()
-    figure013r()
-    figure013s()
-    figure013t()
-    figure013u()
-    figure013v()
-    figure013w()
-    figure013x()
-    figure013y()
-    figure013z()
-    figure013zz()
-    figure013aa()
-    figure013ab()
-    figure013ac()
-    figure013ad()
-    figure013ae()
-    figure013af()
-    figure013ag()
-    figure013ah()
-    figure013ai()
-    figure013aj()
-    figure013ak()
-    figure013al()
-    figure013am()
-    figure013an()
-    figure013ao()
-    figure013ba()
-    figure013bb()
-    figure013bc()
-    figure013bd()
-    figure014a()
-    figure014b()
-    figure014c()
-    figure014d()
-    figure014e()
-    figure014f()
-    figure014g()
-    figure014h()
-    figure014i()
-    figure014j()
-    figure015a()
-    figure015b()
-    figure015c()
-    figure015d()
-    figure015e()
-    figure015f()
-    figure016a()
-    figure016b()
-    figure016c()
-    figure016d()
-    figure016e()
-    figure016f()
-    figure016g()
-    figure016h()
-    figure016i()
-    figure016j()
-    figure016k()
-    figure016l()
-    figure016m()
-    figure016n()
-    figure016o()
-    figure016p()
-    figure016q()
-    figure016r()
-    figure016s()
-    figure016t()
-    figure016u()
-    figure016v()
-    figure016w()
-    figure016x()
-    figure016y()
-    figure016z()
-    figure016aa()
-    figure016ab()
-    figure016ac()
-    figure016ad()
-    figure016ae()
-    figure016af()
-    figure016ag()
-    figure016ah()
-    figure016ai()
-    figure016aj()
-    figure016ak()
-    figure016al()
-    figure016am()
-    figure016an()
-    figure016ao()
-    figure016ap()
-    figure016aq()
-    figure016ar()
-    figure016as()
-    figure016at()
-    figure016au()
-    figure016av()
-    figure016aw()
-    figure016ax()
-    figure016ay()
-    figure016az()
-    figure016ba()
-    figure016bb()
-    figure016bc()
-    figure016bd()
-    figure016be()
-    figure016bf()
-    figure016bg()
-    figure016bh()
-    figure016bi()
-    figure016bj()
-    figure016bk()
-    figure016bl()
-    figure016bm()
-    figure016bn()
-    figure016bo()
-    figure016bp()
-    figure016bq()
-    figure016br()
-    figure016bs()
-    figure016bt()
-    figure016bu()
-    figure016bv()
-    figure016bw()
-    figure016bx()
-    figure016by()
-    figure016bz()
-    figure016ca()
-    figure016cb()
-    figure016cc()
-    figure016cd()
-    figure016ce()
-    figure016cf()
-    figure016cg()
-    figure016ch()
-    figure018a()
-    figure018b()
-    figure018c()
-    figure018d()
-    figure018e()
-    figure018f()
-    figure018g()
-    figure018h()
-    figure018i()
-    figure018j()
-    figure018k()
-    figure018l()
-    figure018m()
-    figure018n()
-    figure018o()
-    figure018p()
-    figure018q()
-    figure018r()
-    figure018s()
-    figure018t()
-    figure018u()
-    figure018v()
-    figure018w()
-    figure018x()
-    figure018y()
-    figure018z()
-    figure018aa()
-    figure018ab()
-    figure018ac()
-    figure018ad()
-    figure018ae()
-    figure019a()
-    figure019b()
-    figure019c()
-    figure019d()
-    figure019e()
-    figure019f()
-    figure019g()
-    figure019h()
-    figure019i()
-    figure019j()
-    figure019k()
-    figure019l()
-    figure019m()
-    figure019n()
-    figure019o()
-    figure019p()
-    figure019q()
-    figure019r()
-    figure019s()
-    figure019t()
-    figure019u()
-    figure019v()
-    figure019w()
-    figure019x()
-    figure019y()
-    figure019z()
-    figure019aa()
-    figure019ab()
-    figure019ac()
-    figure019ad()
-    figure019ae()
-    figure020a()
-    figure020b()
-    figure020c()
-    figure020d()
-    figure020e()
-    figure020f()
-    figure020g()
-    figure020h()
-    figure020i()
-    figure020j()
-    figure021()
-    figure022a()
-    figure022b()
-    figure022c()
-    figure023a()
-    figure023b()
-    figure023c()
-    figure023d()
-    figure023e()
-    figure023f()
-
-    ffigura001()
-    ffigura002a()
-    ffigura002b()
-    ffigura003a()
-    ffigura003b()
-    ffigura003c()
-    ffigura003d()
-    ffigura003e()
-    ffigura003f()
-    ffigura003g()
-    ffigura003h()
-    ffigura003i()
-    ffigura003j()
-    ffigura003k()
-    ffigura003l()
-    ffigura003m()
-    ffigura004a()
-    ffigura004b()
-    ffigura004c()
-    ffigura004d()
-    ffigura005a()
-    ffigura005b()
-    ffigura006a()
-    ffigura006b()
-    ffigura006c()
-    ffigura007a()
-    ffigura007b()
-    ffigura007c()
-    ffigura008a()
-    ffigura008b()
-    ffigura008c()
-    ffigura008d()
-    ffigura009a()
-    ffigura009b()
-    ffigura010a()
-    ffigura010b()
-    ffigura010c()
-    ffigura011a()
-    ffigura011b()
-    ffigura012a()
-    ffigura012b()
-    ffigura012c()
-    ffigura012d()
-    ffigura012e()
-    ffigura013()
-    ffigura013a()
-    ffigura013b()
-    ffigura013c()
-    ffigura013d()
-    ffigura013e()
-    ffigura014()
-    ffigura015a()
-    ffigura015b()
-    ffigura015c()
-    ffigura015d()
-    ffigura015e()
-    ffigura016a()
-    ffigura016b()
-    ffigura016c()
-    ffigura016d()
-    ffigura016e()
-    ffigura016f()
-    ffigura016g()
-    ffigura017()
-    ffigura017b()
-    ffigura018a()
-    ffigura018b()
-    ffigura019()
-    ffigura019b()
-    ffigura020a()
-    ffigura020b()
-    ffigura020c()
-    ffigura020d()
-    ffigura020e()
-    ffigura020f()
-    ffigura020g()
-    ffigura020h()
-    ffigura020i()
-    ffigura020j()
-    ffigura020k()
-    ffigura020l()
-    ffigura020m()
-    ffigura021a()
-    ffigura021b()
-    ffigura021c()
-    ffigura022a()
-    ffigura022b()
-    ffigura022c()
-    ffigura022d()
-    ffigura022e()
-    ffigura022f()
-    ffigura022g()
-    ffigura022h()
-    ffigura022i()
-    ffigura022j()
-    ffigura022k()
-    ffigura022l()
-    ffigura022m()
-    ffigura022n()
-    ffigura022o()
-    ffigura022p()
-    ffigura022q()
-    ffigura022r()
-    ffigura022s()
-    ffigura022t()
-    ffigura022u()
-    ffigura022v()
-    ffigura022w()
-    ffigura022x()
-    ffigura023a()
-    ffigura023b()
-    ffigura023c()
-    ffigura023d()
-    ffigura023e()
-    ffigura023f()
-    ffigura023g()
-    ffigura023h()
-    ffigura023i()
-    ffigura024a()
-    ffigura024b()
-    ffigura024c()
-    ffigura024d()
-    ffigura024e()
-    ffigura024f()
-    ffigura025a()
-    ffigura025b()
-    ffigura025c()
-    ffigura025d()
-    ffigura025e()
-    ffigura025f()
-    ffigura026a()
-    ffigura026b()
-    ffigura028a()
-    ffigura028b()
-    ffigura030a()
-    ffigura030b()
-    ffigura030c()
-    ffigura030d()
-    ffigura031() 
@@ -0,0 +1,16 @@
+# Tangram dels Cinc Triangles
+
+X = 2*R5
+A = (0,0)
+B = (0,X)
+C = (X,X)
+D = (X,0)
+E = B + C
+F = A + C
+
+polygon C D E:   BASE+FILLED(GREEN)
+polygon A E F:   BASE+FILLED(RED)
+polygon E F D:   BASE+FILLED(ORANGE)
+polygon A D F:   BASE+FILLED(YELLOW)
+polygon A B E:   BASE+FILLED(BLUE)
+polygon A B C D: BASE
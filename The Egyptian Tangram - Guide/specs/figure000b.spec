@@ -0,0 +1,20 @@
+# Tangram de la Creu
+
+X = 2*R5
+A = (0,0)
+B = (0,X)
+C = (X,X)
+D = (X,0)
+E = A + D
+F = B + C
+G = 3*C + 2*E
+H = C + 4*E
+I = 3*A + 2*F
+J = A + 4*F
+
+polygon C D E:         BASE+FILLED(GREEN)
+polygon B F J:         BASE+FILLED(RED)
+polygon C G J F:       BASE+FILLED(ORANGE)
+polygon A E H I J B:   BASE+FILLED(YELLOW)
+polygon J G H I:       BASE+FILLED(BLUE)
+polygon A B C D:       BASE
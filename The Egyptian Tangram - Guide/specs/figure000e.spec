@@ -0,0 +1,29 @@
+# El Puzzle Egipci
+
+X = 2*R5
+A = (0,0)
+B = (0,X)
+C = (X,X)
+D = (X,0)
+E = A + D
+F = B + C
+G = 3*C + 2*E
+H = C + 4*E
+I = 3*A + 2*F
+J = A + 4*F
+K = A + B
+L = D + C
+O = I + J
+
+polygon C D E:   BASE+THICK+FILLED(GREEN)
+polygon B F J:   BASE+THICK+FILLED(BLUE)
+polygon O G J:   BASE+THICK+FILLED(YELLOW)
+polygon K I A:   BASE+THICK+FILLED(ORANGE)
+polygon E H D:   BASE+THICK+FILLED(RED)
+polygon C G J F: BASE+THICK+FILLED(RED)
+polygon A E H I: BASE+THICK+FILLED(YELLOW)
+polygon O G H I: BASE+THICK+FILLED(BLUE)
+polygon B J I K: BASE+THICK+FILLED(GREEN)
+polygon D H G L: BASE+THICK+FILLED(ORANGE)
+line B L, K D, A F, E C, O G: BASE+THICK
+polygon A B C D: BASE+THICK
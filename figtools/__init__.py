@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Build tools for the figures.py scripts of "The Egyptian Tangram" documents
+#
+# By: Carlos Luna Mota
+#
+################################################################################
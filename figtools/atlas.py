@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Figure atlas: every figure of a document as a page of one PDF file
+#
+################################################################################
+
+# LIBRARIES
+import os
+import re
+import hashlib
+
+# CONSTANTS
+PDF   = os.path.join("figures", "atlas.pdf")
+INDEX = os.path.join("figures", "atlas.tex")    # \input by text.tex, when it exists
+REF   = re.compile(rb"(\d+) 0 R\b")
+OBJ   = re.compile(rb"(\d+) 0 obj\s*")
+SIGN  = "%% figtools atlas %s\n"
+
+# READING
+# The figures are one-page PDF files written by the PyX PDF writer, which
+# lists every object in a cross-reference table and puts its page object, with
+# its /MediaBox, /Contents and /Resources, in the /Kids of its /Pages.
+
+def _objects(data):
+    # {number: body} of the PDF file data, read through its xref table.
+    start = int(data[data.rindex(b"startxref")+9:].split()[0])
+    lines = data[start:].split(b"\n")
+    (first, count) = map(int, lines[1].split())
+    offsets = {first+i: int(line[:10]) for (i, line) in enumerate(lines[2:2+count]) if line[17:18] == b"n"}
+    ends    = sorted(offsets.values()) + [start]
+    objects = {}
+    for (number, offset) in offsets.items():
+        end  = ends[ends.index(offset)+1]
+        body = data[offset:end]
+        body = body[OBJ.match(body).end():body.rindex(b"endobj")]
+        objects[number] = body.rstrip() + b"\n"
+    return objects
+
+def _split(body):
+    # The dictionary of an object and its stream (b"" for other objects).
+    i = body.find(b">>\nstream\n")
+    return (body, b"") if i < 0 else (body[:i+3], body[i+3:])
+
+def _page(data, objects):
+    root  = int(REF.search(data[data.rindex(b"trailer"):].split(b"/Root", 1)[1]).group(1))
+    pages = int(REF.search(objects[root].split(b"/Pages", 1)[1]).group(1))
+    kids  = objects[pages].split(b"/Kids", 1)[1]
+    return int(REF.search(kids).group(1))
+
+# WRITING
+class atlas:
+    '''A multi-page PDF file made of the pages of one-page PDF files
+
+    The objects reached from every page (contents, fonts, forms...) are
+    copied once for all the pages whose objects are the same bytes, as the
+    fonts of the figures written without stripfonts are.'''
+
+    def __init__(self):
+        self.objects = []   # bodies, numbered from 1
+        self.known   = {}   # sha256 of a body -> its number
+        self.pages   = []   # (number of the page object, name)
+
+    def _add(self, body):
+        key = hashlib.sha256(body).digest()
+        if key not in self.known:
+            self.objects.append(body)
+            self.known[key] = len(self.objects)
+        return self.known[key]
+
+    def _copy(self, number, objects, copied):
+        # Copies the object number of a file (and the objects it refers to
+        # first), returning its number in the atlas.
+        if number not in copied:
+            copied[number] = None   # The objects of a figure never refer back
+            (head, stream) = _split(objects[number])
+            head = REF.sub(lambda m: b"%d 0 R" % self._copy(int(m.group(1)), objects, copied), head)
+            copied[number] = self._add(head + stream)
+        return copied[number]
+
+    def add(self, name, data):
+        '''Adds the page of the PDF file data, which the index calls name'''
+
+        objects = _objects(data)
+        number  = _page(data, objects)
+        copied  = {}
+        page    = re.sub(rb"/Parent \d+ 0 R\n?", b"", objects[number])
+        page    = REF.sub(lambda m: b"%d 0 R" % self._copy(int(m.group(1)), objects, copied), page)
+        self.objects.append(page)
+        self.pages.append((len(self.objects), name))
+
+    def write(self, file):
+        # The /Pages object is written last and every page gets its /Parent.
+        parent = len(self.objects) + 1
+        bodies = list(self.objects)
+        for (number, _) in self.pages:
+            bodies[number-1] = bodies[number-1].replace(b"/Type /Page\n", b"/Type /Page\n/Parent %d 0 R\n" % parent, 1)
+        bodies.append(b"<<\n/Type /Pages\n/Kids [%s]\n/Count %d\n>>\n"
+                      % (b" ".join(b"%d 0 R" % n for (n, _) in self.pages), len(self.pages)))
+        bodies.append(b"<<\n/Type /Catalog\n/Pages %d 0 R\n>>\n" % parent)
+        out = [b"%PDF-1.4\n%\xc3\xb6\xc3\xa9\n"]
+        (size, offsets) = (len(out[0]), [])
+        for (i, body) in enumerate(bodies):
+            chunk = b"%d 0 obj\n" % (i+1) + body + b"endobj\n"
+            offsets.append(size)
+            out.append(chunk)
+            size += len(chunk)
+        out.append(b"xref\n0 %d\n0000000000 65535 f \n" % (len(bodies)+1))
+        out.extend(b"%010d 00000 n \n" % o for o in offsets)
+        out.append(b"trailer\n<<\n/Size %d\n/Root %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n" % (len(bodies)+1, len(bodies), size))
+        file.write(b"".join(out))
+
+# INDEX
+def index(names):
+    '''Returns the LaTeX index of the atlas pages of the figure files names
+
+    After \\input{figures/atlas.tex}, \\includegraphics of any of those files
+    (as "figures/figure000a.pdf") draws its page of the atlas instead.'''
+
+    lines = ["\\makeatletter\n"]
+    lines.extend("\\expandafter\\def\\csname figtools@atlas@%s\\endcsname{%d}\n" % (name, page)
+                 for (page, name) in enumerate(names, 1))
+    lines.append("\\let\\figtools@includegraphics\\includegraphics\n"
+                 "\\renewcommand{\\includegraphics}[2][]{%\n"
+                 "  \\ifcsname figtools@atlas@\\detokenize{#2}\\endcsname\n"
+                 "    \\figtools@includegraphics[#1,page=\\csname figtools@atlas@\\detokenize{#2}\\endcsname]{" +
+                 PDF.replace(os.sep, "/") + "}%\n"
+                 "  \\else\n"
+                 "    \\figtools@includegraphics[#1]{#2}%\n"
+                 "  \\fi}\n"
+                 "\\makeatother\n")
+    return "".join(lines)
+
+def build(root, outputs):
+    '''Writes the atlas of the PDF files outputs (paths relative to root)
+
+    It is left as it is when it was made from the same files, which the
+    first line of the index records.'''
+
+    outputs = sorted(o.replace(os.sep, "/") for o in outputs if o.endswith(".pdf") and os.path.exists(os.path.join(root, o)))
+    sha = hashlib.sha256()
+    for o in outputs:
+        with open(os.path.join(root, o), "rb") as f: sha.update(o.encode("utf-8") + b"\0" + hashlib.sha256(f.read()).digest())
+    sign = SIGN % sha.hexdigest()
+    try:
+        with open(os.path.join(root, INDEX), encoding="utf-8") as f:
+            if f.readline() == sign and os.path.exists(os.path.join(root, PDF)): return False
+    except FileNotFoundError:
+        pass
+    book = atlas()
+    for o in outputs:
+        with open(os.path.join(root, o), "rb") as f: book.add(o, f.read())
+    for (target, write) in ((PDF, book.write), (INDEX, lambda f: f.write((sign + index(outputs)).encode("utf-8")))):
+        path = os.path.join(root, target)
+        with open(path + ".tmp", "wb") as f: write(f)
+        os.replace(path + ".tmp", path)
+    return True
+
+def remove(root):
+    '''Removes the atlas of the document at root, which no longer matches its figures'''
+
+    for target in (INDEX, PDF):
+        try:
+            os.remove(os.path.join(root, target))
+        except FileNotFoundError:
+            pass
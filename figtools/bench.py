@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Benchmarks over the representative figure workloads of the Guide
+#
+################################################################################
+
+# LIBRARIES
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+from figtools.lazy import figure as load_figure
+
+# CONSTANTS
+GUIDE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                     "The Egyptian Tangram - Guide", "figures.py")
+
+WORKLOADS = [("lattice",   "figure000f", "dense point lattice (160,000 candidate dots)"),
+             ("pinwheel",  "figure006h", "recursive pinwheel tiling, depth 5"),
+             ("koch",      "figure006k", "recursive 1:2:sqrt(5) dissection, depth 8"),
+             ("koch_2",    "figure006l", "recursive 1:2:sqrt(5) dissection, depth 10"),
+             ("batch",     "figure021",  "combinatorial batch of 32 PDFs"),
+             ("grid",      "figure022d", "dotted grid loops"),
+             ("cairo",     "figure023a", "Cairo tiling"),
+             ("text",      "figure029",  "text-heavy figure (LaTeX labels)")]
+
+# BENCHMARK
+def measure(function, repeat):
+    '''Returns the wall times of repeat calls to function'''
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+def bench(path=GUIDE, repeat=5, only=None):
+    '''Runs the workloads in a scratch directory and returns the results
+
+    Each workload is rendered once to warm up (imports, TeX start) and then
+    repeat more times; the results record the best and median times.'''
+
+    from figtools import texpool
+    results = {"commit":   _commit(), "python": platform.python_version(),
+               "pyx":      _version("pyx"), "machine": platform.machine(),
+               "repeat":   repeat, "workloads": {}}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        os.mkdir("figures")
+        try:
+            for (workload, figure, description) in WORKLOADS:
+                if only and workload not in only: continue
+                function = load_figure(path, figure, texpool.install)
+                function()
+                times = measure(function, repeat)
+                results["workloads"][workload] = {"figure": figure, "description": description,
+                                                  "best": min(times), "median": statistics.median(times)}
+        finally:
+            os.chdir(cwd)
+    return results
+
+def compare(results, baseline, threshold=0.10):
+    '''Returns the workloads whose median time regressed more than threshold'''
+
+    regressions = []
+    for (workload, r) in results["workloads"].items():
+        b = baseline["workloads"].get(workload)
+        if b and r["median"] > b["median"]*(1+threshold):
+            regressions.append((workload, b["median"], r["median"]))
+    return regressions
+
+# AUXILIARY FUNCTIONS
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def _version(package):
+    try:
+        return __import__(package).__version__
+    except (ImportError, AttributeError):
+        return None
+
+# MAIN
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m figtools.bench", description="Benchmarks the figure workloads")
+    p.add_argument("workloads", nargs="*", help="workloads to run (default: all of %s)" % ", ".join(w for (w, _, _) in WORKLOADS))
+    p.add_argument("--script",    default=GUIDE, help="figures.py script to benchmark (default: the Guide)")
+    p.add_argument("--repeat",    type=int, default=5, help="timed repetitions per workload (default: 5)")
+    p.add_argument("--save",      metavar="FILE", help="write the results to FILE (JSON)")
+    p.add_argument("--compare",   metavar="FILE", help="compare against the results saved in FILE")
+    p.add_argument("--threshold", type=float, default=0.10, help="tolerated slowdown of the median (default: 0.10)")
+    args = p.parse_args(argv)
+
+    results = bench(args.script, args.repeat, args.workloads)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f)
+
+    print("commit %s, python %s, pyx %s" % (results["commit"], results["python"], results["pyx"]))
+    print("%-10s %-12s %10s %10s %10s" % ("workload", "figure", "best(s)", "median(s)", "baseline"))
+    for (workload, r) in results["workloads"].items():
+        b = baseline["workloads"].get(workload, {}).get("median") if baseline else None
+        print("%-10s %-12s %10.4f %10.4f %10s" % (workload, r["figure"], r["best"], r["median"],
+                                                   "-" if b is None else "%+.1f%%" % (100*(r["median"]/b-1))))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f: json.dump(results, f, indent=1)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for (workload, before, after) in regressions:
+            print("REGRESSION %s: %.4fs -> %.4fs" % (workload, before, after), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Document build: figures, pdflatex passes, pdftk and ghostscript, as needed
+#
+################################################################################
+
+# LIBRARIES
+import os
+import sys
+import glob
+import json
+import argparse
+import threading
+import subprocess
+
+from figtools.manifest import digest
+from figtools.runner import run
+
+# CONSTANTS
+VERSION = 1
+STATE   = ".build.json"     # Digests of the inputs and outputs of the last pdftk and gs steps
+TEXT    = "text"            # Every document is text.tex
+PASSES  = 4                 # pdflatex passes before giving up on a stable .aux
+READ    = ("aux", "toc", "out", "lof", "lot", "nav", "snm")  # Files a pass reads from the one before
+
+PDFLATEX = ["pdflatex", "-shell-escape", "-interaction=nonstopmode", "-halt-on-error"]
+PDFTK    = ["pdftk", TEXT + ".pdf", "cat", "output", TEXT + "_.pdf"]
+GS       = ["gs", "-sDEVICE=pdfwrite", "-dCompatibilityLevel=1.4", "-dPrinted=false", "-dPDFSETTINGS=/prepress",
+            "-dNOPAUSE", "-dQUIET", "-dBATCH"]
+
+# STEPS
+def _digests(root, patterns):
+    # {file: sha256} of the files matching the glob patterns under root.
+    return {os.path.relpath(f, root): digest(f) for p in patterns
+            for f in glob.glob(os.path.join(glob.escape(root), p)) if not f.endswith(".part")}
+
+def environment(root):
+    # pdflatex writes the same bytes for the same input only with a fixed
+    # SOURCE_DATE_EPOCH (for its /CreationDate and /ID), which is the date of
+    # the last commit of the document unless it is set already.
+    env = dict(os.environ)
+    if "SOURCE_DATE_EPOCH" not in env:
+        try:
+            date = subprocess.run(["git", "log", "-1", "--format=%ct", "--", "."], cwd=root,
+                                  capture_output=True, text=True).stdout.strip()
+            if date: env["SOURCE_DATE_EPOCH"] = date
+        except OSError:
+            pass
+    return env
+
+def pdflatex(root, env):
+    '''Runs a pdflatex pass over text.tex, returning its exit status and output'''
+
+    done = subprocess.run(PDFLATEX + [TEXT + ".tex"], cwd=root, env=env, stdin=subprocess.DEVNULL,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    return done.returncode, done.stdout.decode("utf-8", "replace")
+
+def _step(root, state, name, command, inputs, output, log):
+    # Runs command unless the digests of its inputs and its output are those
+    # recorded after its last run.
+    digests = {f: digest(os.path.join(root, f)) for f in inputs}
+    last    = state.get(name)
+    current = digest(os.path.join(root, output))
+    if last and last["inputs"] == digests and current is not None and last["output"] == current:
+        log("%-8s unchanged input, skipped" % name)
+        return
+    subprocess.run(command, cwd=root, check=True)
+    state[name] = {"inputs": digests, "output": digest(os.path.join(root, output))}
+    log("%-8s done" % name)
+
+# BUILD
+def latex(root, env, background=None, log=print):
+    '''Runs the pdflatex passes over text.tex of the document in root
+
+    background, if given, runs in a thread during the first pass (which sees
+    the figures as they were); its exception, if any, is raised after that
+    pass. A pass is repeated only while it changes the .aux, .toc... files it
+    reads back or while a figure it included has changed since it started.'''
+
+    failed = []
+    def target():
+        try:
+            background()
+        except BaseException as e:
+            failed.append(e)
+    thread = threading.Thread(target=target) if background else None
+    seen   = _digests(root, ["figures/*.pdf", "figures/atlas.tex"])
+    if thread: thread.start()
+
+    passes = 0
+    while True:
+        before = _digests(root, [TEXT + "." + s for s in READ])
+        (status, out) = pdflatex(root, env)
+        passes += 1
+        if thread and passes == 1:
+            thread.join()
+            if failed: raise failed[0]
+        now   = _digests(root, ["figures/*.pdf", "figures/atlas.tex"])
+        stale = now != seen
+        seen  = now
+        if status and not stale:
+            sys.stderr.write(out[-3000:])
+            raise RuntimeError("pdflatex failed on %s" % os.path.join(root, TEXT + ".tex"))
+        log("pdflatex pass %d%s" % (passes, " (figures changed meanwhile)" if stale else ""))
+        if not stale and _digests(root, [TEXT + "." + s for s in READ]) == before: break
+        if passes == PASSES:
+            log("pdflatex the .aux files still change after %d passes" % passes)
+            break
+
+def build(root, output, jobs=None, force=False, atlas=False, log=print):
+    '''Builds the document in the folder root as output (a file name in it)
+
+    The figures are rendered in the background (see figtools.runner) while
+    the first pdflatex pass runs (see latex()). pdftk and gs run only when
+    their inputs are not the ones of their last run. With atlas set, text.tex
+    includes the figures from the figtools.atlas.'''
+
+    root   = os.path.abspath(root)
+    env    = environment(root)
+    script = os.path.join(root, "figures.py")
+    def figures():
+        results = list(run(script, jobs=jobs, force=force, atlas=atlas))
+        bad     = [r.name for r in results if not r.ok]
+        log("figures  %d rendered, %d copied, %d failed" % (sum(1 for r in results if r.ok and not r.shared),
+                                                              sum(1 for r in results if r.shared), len(bad)))
+        if bad: raise RuntimeError("figures failed: " + " ".join(bad))
+    latex(root, env, figures, log)
+
+    path  = os.path.join(root, STATE)
+    state = {}
+    try:
+        with open(path, encoding="utf-8") as f: data = json.load(f)
+        if data.get("version") == VERSION: state = data["steps"]
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    try:
+        _step(root, state, "pdftk", PDFTK, [TEXT + ".pdf"], TEXT + "_.pdf", log)
+        _step(root, state, "gs", GS + ["-sOutputFile=" + output, TEXT + "_.pdf", "pdfmark"],
+              [TEXT + "_.pdf", "pdfmark"], output, log)
+    finally:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION, "steps": state}, f, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+# MAIN
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m figtools.build",
+                                description="Builds a document: its figures, text.tex and the final PDF")
+    p.add_argument("root", nargs="?", default=".", help="document folder (default: the current one)")
+    p.add_argument("-o", "--output", help="final PDF, in the document folder (default: the name of the folder)")
+    p.add_argument("-j", "--jobs",   type=int, metavar="N", help="number of figure worker processes (default: all cores)")
+    p.add_argument("-f", "--force",  action="store_true", help="render even the figures that are up to date")
+    p.add_argument("-A", "--atlas",  action="store_true", help="include the figures from a single atlas PDF file")
+    args = p.parse_args(argv)
+
+    output = args.output or os.path.basename(os.path.abspath(args.root)) + ".pdf"
+    try:
+        build(args.root, output, args.jobs, args.force, args.atlas)
+    except (RuntimeError, subprocess.CalledProcessError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Figure canvas: a PyX canvas that optimises the drawing it is given
+#
+################################################################################
+
+# LIBRARIES
+import os
+import tempfile
+from contextlib import contextmanager
+
+from pyx import canvas as pyxcanvas
+from pyx import document, path, style, trafo
+
+from figtools import forms, palette, pdf, raster, svg
+
+# COALESCING
+def _mergeable(p, s):
+    # Plain strokes only (no fills, arrows or text, which must keep their
+    # place in the z-order) of paths that open their own subpath and have no
+    # empty subpath (PyX cannot close those but in the first subpath).
+    if not (isinstance(p, path.path) and all(isinstance(a, style.style) for a in s)): return False
+    items = p.pathitems
+    return (len(items) > 1 and isinstance(items[0], path.moveto_pt) and
+            not any(isinstance(a, path.moveto_pt) and isinstance(b, (path.moveto_pt, path.closepath))
+                    for (a, b) in zip(items, items[1:])))
+
+def _item(item):
+    return (type(item).__name__,) + tuple(getattr(item, slot) for cls in type(item).__mro__
+                                          for slot in getattr(cls, "__slots__", ()))
+
+def _edge(p):
+    # Exact identity of a path, which for a single segment ignores direction.
+    items = tuple(_item(i) for i in p.pathitems)
+    if len(items) == 2 and isinstance(p.pathitems[1], path.lineto_pt):
+        (a, b) = (items[0][1:], items[1][1:])
+        return ("segment",) + min((a, b), (b, a))
+    return items
+
+def coalesce(drawing):
+    '''Returns the (path, style) list drawing with its plain strokes merged
+
+    Every run of consecutive plain strokes that share the same style becomes a
+    single path with one subpath each (PDF restarts dash patterns on every
+    subpath, so it looks the same), and the paths repeated in a run are
+    dropped. Fills and decorated paths stay where they were, so the z-order
+    of the figure is preserved.'''
+
+    result = []
+    (run, key, seen) = (None, None, None)
+    for (p, s) in drawing:
+        if not _mergeable(p, s):
+            result.append((p, s))
+            run = None
+            continue
+        # The style lists are built from the shared style constants (BASE,
+        # THIN, COLOR(BLACK)...), so the same style is made of the same objects.
+        k = tuple(id(a) for a in s)
+        if run is None or k != key:
+            (run, key, seen) = ([], k, set())
+            result.append((run, s))
+        e = _edge(p)
+        if e in seen: continue
+        seen.add(e)
+        run.append(p)
+    return [(p if not isinstance(p, list) else p[0] if len(p) == 1 else
+             path.path(*[i for q in p for i in q.pathitems]), s) for (p, s) in result]
+
+# STREAMS
+class _stream:
+    # Strokes streamed into a canvas (see canvas.stream()) and, once laid
+    # out, the forms.choice of the outlines to place and their forms.
+    def __init__(self, source, choice=None):
+        self.source = source
+        self.choice = choice
+        self.found  = {}    # key -> forms.form, the same for every iteration
+
+    def __iter__(self):
+        # The outlines placed split the runs of strokes coalesced, as in
+        # canvas.layout().
+        (run, key) = ([], None)
+        for (p, s) in self.source():
+            shape = self.choice(p, s) if self.choice else None
+            k     = _run((p, s)) if shape is None else None
+            if run and k != key:
+                yield from ((q, t, None) for (q, t) in coalesce(run))
+                run = []
+            if shape is None:
+                run.append((p, s))
+                key = k
+                continue
+            (k, canonical, matrix) = shape
+            if k not in self.found: self.found[k] = forms.form(canonical, s)
+            yield (p, s, (self.found[k], matrix))
+        yield from ((q, t, None) for (q, t) in coalesce(run))
+
+class entries:
+    '''The (path, style, placed) entries of a canvas, its streamed strokes included
+
+    parts are lists of entries and laid out _streams. Every iteration runs the
+    sources of the streams again, so the writers may go through the entries
+    more than once and the streamed strokes are never all held at the same
+    time: only each run of consecutive plain strokes of the same style, to
+    coalesce it.'''
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    def __iter__(self):
+        for part in self.parts:
+            yield from part
+
+def _run(stroke):
+    # The same key for the consecutive strokes coalesce() merges (and a new
+    # object, equal to no other key, for the rest).
+    (p, s) = stroke
+    return tuple(id(a) for a in s) if _mergeable(p, s) else object()
+
+# CANVAS
+class canvas(pyxcanvas.canvas):
+    '''A PyX canvas that coalesces the strokes of the figure drawn on it
+
+    Strokes are held back until anything else is drawn or inserted, or until
+    the canvas is measured or written out. Then the piece outlines stroked at
+    least instances times (congruent and with the same style, as in tilings)
+    are written once as PDF Form XObjects and placed by a matrix each time,
+    where that makes the file smaller, and the rest of the strokes are
+    coalesced. A canvas holding nothing but plain strokes writes its PDF and
+    SVG files through figtools.pdf and figtools.svg, and its PNG thumbnails
+    through figtools.raster, instead of building the PyX canvas items.
+
+    The canvas also keeps the log of what was drawn on it, so that the same
+    figure can be written again in the colours of each figtools.palette.
+    Deep subdivisions can stream() their strokes instead, which the canvas
+    makes again every time it writes them rather than keeping them.'''
+
+    instances = 2           # 0 draws every piece outline inline
+    formats   = ("pdf",)    # The files writePDFfile() writes: "pdf", "svg" and/or "png"
+    symbols   = False       # SVG files define repeated outlines once as <symbol>s
+    thumbnail = raster.SIZE # Larger side of the PNG thumbnails in pixels
+    palettes  = ()          # Palettes of the variants writePDFfile() writes too, as file-name.pdf
+    stripfonts = True       # False embeds whole fonts, which the pages of a figtools.atlas share
+
+    def __init__(self, attrs=None, *args, **kwargs):
+        self.pending   = []
+        self.log       = []     # ("stroke" | "draw" | "insert", path or item, attrs)
+        self.logging   = True
+        self.arguments = (attrs, args, kwargs)
+        super().__init__(attrs, *args, **kwargs)
+
+    @contextmanager
+    def _unlogged(self):
+        # The PyX canvas draws and inserts through the methods below too.
+        (logging, self.logging) = (self.logging, False)
+        try:
+            yield
+        finally:
+            self.logging = logging
+
+    def layout(self, symbols=False):
+        '''Returns the pending strokes as (path, style, placed) canvas.entries
+
+        placed is None for the coalesced strokes and the (form, matrix) of the
+        forms.form that draws the outline of path in its place otherwise. With
+        symbols set, every outline stroked at least twice is placed, as the
+        SVG <symbol>s of figtools.svg (whose files are not compressed, so the
+        PDF size rule does not apply). The streamed strokes are laid out the
+        same way, by a forms.choice that goes through them twice.'''
+
+        (parts, run) = ([], [])
+        for entry in self.pending + [None]:
+            if isinstance(entry, tuple):
+                run.append(entry)
+                continue
+            if run: parts.append(self._layout(run, symbols))
+            if entry is not None: parts.append(_stream(entry.source, self._choice(entry.source, symbols)))
+            run = []
+        return entries(parts)
+
+    def _choice(self, source, symbols):
+        if symbols: return forms.choice(source, 2, smaller=False)
+        if self.instances: return forms.choice(source, self.instances)
+        return None
+
+    def _layout(self, pending, symbols):
+        if symbols: shapes = forms.plan(pending, 2, smaller=False)
+        elif self.instances: shapes = forms.plan(pending, self.instances)
+        else: shapes = [None]*len(pending)
+        result = []
+        (run, found) = ([], {})
+        for ((p, s), shape) in zip(pending, shapes):
+            if shape is None:
+                run.append((p, s))
+                continue
+            (key, canonical, matrix) = shape
+            result.extend((q, t, None) for (q, t) in coalesce(run))
+            run = []
+            if key not in found: found[key] = forms.form(canonical, s)
+            result.append((p, s, (found[key], matrix)))
+        result.extend((q, t, None) for (q, t) in coalesce(run))
+        return result
+
+    def flush(self):
+        if not self.pending: return
+        entries = self.layout()
+        self.pending = []
+        with self._unlogged():
+            for (p, s, placed) in entries:
+                if placed is None: super().stroke(p, s)
+                else: super().insert(forms.instance(*placed, p, s))
+
+    def stroke(self, path, attrs=[]):
+        self.pending.append((path, list(attrs)))
+        if self.logging: self.log.append(("stroke", path, list(attrs)))
+
+    def stream(self, source):
+        '''Strokes the (path, style) pairs that source() yields, without keeping them
+
+        source is called again every time the strokes are needed (twice for
+        an SVG or PNG file, whose bounding box comes first, and once more per
+        palette), so it must yield the same strokes every time.'''
+
+        self.pending.append(_stream(source))
+        if self.logging: self.log.append(("stream", source, None))
+
+    def draw(self, path, attrs):
+        self.flush()
+        if self.logging: self.log.append(("draw", path, list(attrs)))
+        with self._unlogged():
+            super().draw(path, attrs)
+
+    def insert(self, item, attrs=None):
+        self.flush()
+        if self.logging: self.log.append(("insert", item, attrs))
+        return super().insert(item, attrs)
+
+    def clear(self):
+        self.pending = []
+        self.log     = []
+        super().clear()
+
+    def recoloured(self, recolouring):
+        '''Returns a new canvas with what was drawn on this one, in other colours
+
+        recolouring is a figtools.palette.recolouring. The paths are the same
+        objects: only the styles (and the canvases inserted) are new.'''
+
+        (attrs, args, kwargs) = self.arguments
+        copy = type(self)(recolouring(attrs) if attrs else attrs, *args, **kwargs)
+        for (kind, item, attrs) in self.log:
+            if kind == "stroke": copy.stroke(item, recolouring(attrs))
+            elif kind == "stream": copy.stream(lambda source=item: ((p, recolouring(s)) for (p, s) in source()))
+            elif kind == "draw": copy.draw(item, recolouring(attrs))
+            else: copy.insert(item.recoloured(recolouring) if isinstance(item, canvas) else item,
+                              recolouring(attrs) if attrs else attrs)
+        return copy
+
+    def __len__(self):
+        self.flush()
+        return super().__len__()
+
+    def __getitem__(self, i):
+        self.flush()
+        return super().__getitem__(i)
+
+    def bbox(self):
+        self.flush()
+        return super().bbox()
+
+    def processPS(self, *args):
+        self.flush()
+        return super().processPS(*args)
+
+    def processPDF(self, *args):
+        self.flush()
+        return super().processPDF(*args)
+
+    def processSVG(self, *args):
+        self.flush()
+        return super().processSVG(*args)
+
+    def _direct(self):
+        # Figures made only of plain strokes skip the PyX canvas items.
+        return not (self.items or self.clip is not None or self.trafo is not trafo.identity or
+                    not self.pending or not pdf.supported(self._strokes()))
+
+    def _strokes(self):
+        # The (path, style) pairs of the pending strokes, streamed or not.
+        for entry in self.pending:
+            if isinstance(entry, _stream): yield from entry.source()
+            else: yield entry
+
+    def writePDFfile(self, file=None, **kwargs):
+        # The figures.py scripts write every figure through this call, so it
+        # writes the figure in each of the palettes and formats asked for.
+        if isinstance(file, str) and self.palettes:
+            name = file[:-4] if file.endswith(".pdf") else file
+            for p in self.palettes:
+                self.recoloured(palette.recolouring(palette.get(p)))._write(name + "-" + p, **kwargs)
+        self._write(file, **kwargs)
+
+    def _write(self, file, **kwargs):
+        # Writes the figure in each of the formats asked for (as file.svg...).
+        if not self.stripfonts: kwargs.setdefault("write_stripfonts", False)
+        if isinstance(file, str) and self.formats != ("pdf",):
+            name = file[:-4] if file.endswith(".pdf") else file
+            page = {k: v for (k, v) in kwargs.items() if k.startswith("page_")}
+            if "svg" in self.formats: self.writeSVGfile(name, **page)
+            if "png" in self.formats: self.writePNGfile(name, **page)
+            if "pdf" not in self.formats: return
+        if not self._direct() or pdf.options(kwargs) is None:
+            return super().writePDFfile(file, **kwargs)
+        pdf.write(self.layout(), file, **kwargs)
+
+    def writeSVGfile(self, file=None, **kwargs):
+        if not self._direct() or svg.options(kwargs) is None:
+            return super().writeSVGfile(file, **kwargs)
+        svg.write(self.layout(self.symbols), file, self.symbols, **svg.options(kwargs))
+
+    def writePNGfile(self, file=None, size=None, **kwargs):
+        '''Writes the PNG thumbnail of the canvas, size pixels wide or high
+
+        Figures with anything but plain strokes (text...) are rasterised from
+        their PDF file by ghostscript.'''
+
+        size = size or self.thumbnail
+        if self._direct() and svg.options(kwargs) is not None:
+            return raster.write(self.layout(), file, size, **svg.options(kwargs))
+        b = self.bbox()
+        with tempfile.TemporaryDirectory() as tmp:
+            super().writePDFfile(os.path.join(tmp, "figure"), **kwargs)
+            data = raster.ghostscript(os.path.join(tmp, "figure.pdf"), 72*size/max(b.width_pt(), b.height_pt(), 1))
+        with document._outputstream(file, "png") as f: f.write(data)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Command line interface shared by the figures.py scripts
+#
+################################################################################
+
+# LIBRARIES
+import os
+import re
+import sys
+import fnmatch
+import argparse
+
+from figtools.runner import discover, plan, run
+
+# ARGUMENTS
+def parser(path):
+    p = argparse.ArgumentParser(prog=path, description="Renders the figures of " + path)
+    p.add_argument("patterns", nargs="*", metavar="PATTERN",
+                   help="glob (e.g. 'figure019*') selecting the figures to render (default: all)")
+    p.add_argument("-r", "--regex",   action="store_true", help="patterns are regular expressions")
+    p.add_argument("-l", "--list",    action="store_true", help="list the selected figures and their docstrings")
+    p.add_argument("-n", "--dry-run", action="store_true", help="show what would be rendered and exit")
+    p.add_argument("-f", "--force",   action="store_true", help="render even the figures that are up to date")
+    p.add_argument("-j", "--jobs",    type=int, metavar="N", help="number of worker processes (default: all cores)")
+    p.add_argument("-p", "--profile", nargs="?", const="profile", metavar="FILE",
+                   help="render all selected figures and write their time, memory, primitive count and "
+                        "output size to FILE.json and FILE.csv (default: profile)")
+    p.add_argument("--top",           type=int, default=10, metavar="N", help="figures in the profile summary (default: 10)")
+    p.add_argument("-F", "--format",  action="append", choices=["pdf", "svg", "png"], dest="formats",
+                   help="write the figures in this format (repeat for several; default: pdf)")
+    p.add_argument("--symbols",       action="store_true",
+                   help="define the piece outlines repeated in an SVG figure once, as <symbol> elements")
+    p.add_argument("--thumbnail",     type=int, metavar="N",
+                   help="width or height (whichever is larger) of the PNG thumbnails in pixels (default: 256)")
+    p.add_argument("-A", "--atlas",   action="store_true",
+                   help="also bundle the PDF files of all the figures in figures/atlas.pdf, indexed by figures/atlas.tex")
+    p.add_argument("-P", "--palette", action="append", default=[], metavar="NAME", dest="palettes",
+                   help="also write every figure in this palette, as figureNNN-NAME (repeat for several: "
+                        "cmyk, greyscale, contrast or one of the PALETTES of the script)")
+    p.add_argument("-w", "--watch",   action="store_true",
+                   help="keep rendering the selected figures as they change, in warm workers, until Ctrl+C")
+    p.add_argument("--latex",         action="store_true", help="with --watch, also rebuild text.tex after every change")
+    return p
+
+def select(figures, patterns, regex=False):
+    '''Returns the (name, docstring) pairs whose name matches any pattern'''
+
+    if not patterns: return figures
+    if regex: match = lambda name, p: re.search(p, name)
+    else:     match = fnmatch.fnmatchcase
+    return [(n, d) for (n, d) in figures if any(match(n, p) for p in patterns)]
+
+# MAIN
+def main(path, argv=None):
+    '''Entry point of every figures.py script (path is its __file__)'''
+
+    args    = parser(path).parse_args(argv)
+    formats = tuple(args.formats or ["pdf"])
+    figures = select(discover(path), args.patterns, args.regex)
+    names   = [n for (n, _) in figures]
+    if not figures:
+        print("No figure matches " + " ".join(args.patterns), file=sys.stderr)
+        return 2
+
+    if args.palettes:
+        from figtools import palette
+        unknown = sorted(set(args.palettes) - set(palette.names(path)))
+        if unknown:
+            print("Unknown palette %s (there are %s)" % (", ".join(unknown), ", ".join(palette.names(path))), file=sys.stderr)
+            return 2
+
+    if args.list:
+        for (name, doc) in figures: print("%-16s %s" % (name, doc.split("\n")[0]))
+        return 0
+
+    if args.watch:
+        from figtools.watch import watch
+        return watch(path, lambda figures: select(figures, args.patterns, args.regex), args.jobs,
+                     formats, args.symbols, args.thumbnail, args.palettes, args.atlas, args.latex)
+
+    if args.dry_run:
+        todo = plan(path, names, args.force, formats, args.symbols, args.thumbnail, args.palettes, args.atlas)
+        for name in todo: print(name)
+        print("%d figures would be rendered, %d are up to date" % (len(todo), len(names)-len(todo)))
+        return 0
+
+    failed, rendered, shared, tex, profiles = [], 0, 0, {}, []
+    for r in run(path, names, args.jobs, args.force or bool(args.profile), bool(args.profile),
+                 formats, args.symbols, args.thumbnail, args.palettes, args.atlas):
+        print("%-16s %s %7.2fs" % (r.name, "copy" if r.shared else "ok  " if r.ok else "FAIL", r.seconds))
+        if not r.ok: failed.append(r)
+        if r.profile: profiles.append(r.profile)
+        if r.tex: tex[r.tex[0]] = r.tex[1:]
+        if r.shared: shared += 1
+        elif r.ok:   rendered += 1
+    for r in failed:
+        print("\n" + r.name + ":\n" + r.error, file=sys.stderr)
+    print("%d figures rendered, %d copied from the shared cache, %d failed, %d up to date"
+          % (rendered, shared, len(failed), len(names)-rendered-shared-len(failed)))
+    if tex:
+        (starts, texts, hits, _) = [sum(t) for t in zip(*tex.values())]
+        print("TeX: %d processes typeset %d texts (%.1f each), %d more came from the cache"
+              % (starts, texts, texts/max(starts, 1), hits))
+    if profiles:
+        from figtools import profile
+        basename = os.path.join(os.path.dirname(os.path.abspath(path)), args.profile)
+        profile.write(profiles, basename)
+        print("\n".join([""] + profile.summary(profiles, args.top)))
+        print("Full profile written to %s.json and %s.csv" % (basename, basename))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main(sys.argv[1], sys.argv[2:]))
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Instancing: repeated piece outlines written once as PDF Form XObjects
+#
+################################################################################
+
+# LIBRARIES
+import io
+import zlib
+import hashlib
+from math import atan2, cos, sin, hypot
+
+from pyx import bbox, canvas, deco, path, pdfwriter, style, trafo, writer
+
+# CONSTANTS
+QUANTUM  = 1e-4 # Two vertices closer than this (in pt) are the same vertex
+VERTICES = 3    # Simpler paths (segments) cost more as instances than inline
+FORM     = 300  # Bytes taken by the object and resource entry of a form
+
+# SHAPES
+def _style(s):
+    # A key for the style list s, or None if it cannot be instanced. The style
+    # constants are shared objects and FILLED() wraps them in a new deco.filled.
+    key = []
+    for a in s:
+        if isinstance(a, style.style):
+            key.append(id(a))
+        elif type(a) is type(deco.filled) and all(isinstance(b, style.style) for b in a.styles):
+            key.append(("filled",) + tuple(id(b) for b in a.styles))
+        else:
+            return None
+    return tuple(key)
+
+def _polygon(p):
+    # The vertices of a moveto/lineto(/closepath) path, or None.
+    items = getattr(p, "pathitems", None)
+    if not items or not isinstance(items[0], path.moveto_pt): return None
+    closed = isinstance(items[-1], path.closepath)
+    body   = items[1:-1] if closed else items[1:]
+    if not all(type(i) in (path.lineto, path.lineto_pt) for i in body): return None
+    return [(i.x_pt, i.y_pt) for i in items[:len(body)+1]], closed
+
+def _dashed(s):
+    for a in s:
+        d = a.d if isinstance(a, style.linestyle) else a if isinstance(a, style.dash) else None
+        if d is not None and d.pattern: return True
+    return False
+
+def _canonical(points):
+    # Moves points so that the first is the origin and the first side lies on
+    # the positive x axis, mirrored if that gives the smaller key.
+    (x0, y0) = points[0]
+    for (x, y) in points[1:]:
+        if hypot(x-x0, y-y0) > QUANTUM: break
+    else:
+        return None
+    angle = atan2(y-y0, x-x0)
+    (C, S) = (cos(angle), sin(angle))
+    local  = [((x-x0)*C + (y-y0)*S, (y-y0)*C - (x-x0)*S) for (x, y) in points]
+    keys   = [tuple((round(x/QUANTUM), round(sign*y/QUANTUM)) for (x, y) in local) for sign in (1, -1)]
+    sign   = 1 if keys[0] <= keys[1] else -1
+    return keys[(1-sign)//2], [(x, sign*y) for (x, y) in local], (((C, -S*sign), (S, C*sign)), (x0, y0))
+
+def _outline(p, s):
+    # The (style key, vertices, closed) of a stroke that may be instanced.
+    (skey, polygon) = (_style(s), _polygon(p))
+    if skey is None or polygon is None: return None
+    (points, closed) = polygon
+    if closed and len(points) > 1 and hypot(points[-1][0]-points[0][0], points[-1][1]-points[0][1]) <= QUANTUM:
+        points = points[:-1]
+    if len(points) < VERTICES: return None
+    return skey, points, closed
+
+def _signature(p, s):
+    # A cheap key shared by all the strokes congruent to p with style s (and
+    # by some others), so that only its repeated values need a shape().
+    outline = _outline(p, s)
+    if outline is None: return None
+    (skey, points, closed) = outline
+    sides = zip(points, points[1:] + points[:1] if closed else points[1:])
+    return skey, closed, len(points), round(sum(hypot(x1-x0, y1-y0) for ((x0, y0), (x1, y1)) in sides), 2)
+
+def shape(p, s):
+    '''Returns (key, canonical, matrix) for the stroke of path p with style s
+
+    canonical is the path moved so that its first vertex is the origin and its
+    first side lies on the positive x axis (mirrored when that gives a smaller
+    key) and matrix the ((a, c), (b, d)), (e, f) transformation that places it
+    back. Closed outlines without dashes may start at any vertex and run in
+    either direction, which draws the same. Congruent paths with the same style
+    share their key, which is None for the strokes that cannot be instanced.'''
+
+    outline = _outline(p, s)
+    if outline is None: return None, None, None
+    (skey, points, closed) = outline
+    if closed and not _dashed(s):
+        n = len(points)
+        candidates = [points[i:] + points[:i] for i in range(n)]
+        candidates += [list(reversed(c)) for c in candidates]
+    else:
+        candidates = [points]
+    best = min((c for c in map(_canonical, candidates) if c is not None), default=None)
+    if best is None: return None, None, None
+    (key, canonical, matrix) = best
+    return (skey, closed, key), (canonical, closed), matrix
+
+def _inline(points, closed):
+    return "%f %f m\n" % points[0] + "".join("%f %f l\n" % P for P in points[1:]) + ("h\n" if closed else "")
+
+def _placement(matrix):
+    (((a, c), (b, d)), (e, f)) = matrix
+    return "q\n%f %f %f %f %f %f cm\n/Fm000000000000 Do\nQ\n" % (a, b, c, d, e, f)
+
+def plan(drawing, minimum=2, smaller=True):
+    '''Returns the (key, canonical, matrix) shape of every stroke of drawing to instance
+
+    The entries of the strokes to draw inline are None. A shape is instanced
+    when it is stroked at least minimum times and, if smaller is set, its form
+    and placements take less room in the (compressed) PDF than drawing it
+    inline every time.'''
+
+    signatures = {}
+    for (i, (p, s)) in enumerate(drawing):
+        signature = _signature(p, s)
+        if signature is not None: signatures.setdefault(signature, []).append(i)
+    shapes = [(None, None, None)]*len(drawing)
+    for entries in signatures.values():
+        if len(entries) < minimum: continue
+        for i in entries: shapes[i] = shape(*drawing[i])
+    groups = {}
+    for (i, (key, _, _)) in enumerate(shapes):
+        if key is not None: groups.setdefault(key, []).append(i)
+    chosen = set()
+    for (key, entries) in groups.items():
+        if len(entries) < minimum: continue
+        if not smaller:
+            chosen.add(key)
+            continue
+        inline = "".join(_inline(*_polygon(drawing[i][0])) for i in entries)
+        placed = "".join(_placement(shapes[i][2]) for i in entries)
+        if len(zlib.compress(placed.encode())) + FORM < len(zlib.compress(inline.encode())): chosen.add(key)
+    return [shape if shape[0] in chosen else None for shape in shapes]
+
+class choice:
+    '''The shapes plan() would instance among the strokes source() yields, found without keeping them
+
+    source is called twice: once to count the strokes of every signature,
+    and once for the shapes of the repeated signatures, whose inline and
+    placed PDF code is compressed as it comes. Called with a stroke, the
+    choice returns its (key, canonical, matrix) shape if it is instanced and
+    None otherwise.'''
+
+    def __init__(self, source, minimum=2, smaller=True):
+        counts = {}
+        for (p, s) in source():
+            signature = _signature(p, s)
+            if signature is not None: counts[signature] = counts.get(signature, 0) + 1
+        self.signatures = {k for (k, n) in counts.items() if n >= minimum}
+        groups = {}     # key -> [strokes, inline compressor, placed compressor, inline bytes, placed bytes]
+        for (p, s) in source():
+            if _signature(p, s) not in self.signatures: continue
+            (key, _, matrix) = shape(p, s)
+            if key is None: continue
+            if key not in groups: groups[key] = [0, zlib.compressobj(), zlib.compressobj(), 0, 0]
+            group = groups[key]
+            group[0] += 1
+            if smaller:
+                group[3] += len(group[1].compress(_inline(*_polygon(p)).encode()))
+                group[4] += len(group[2].compress(_placement(matrix).encode()))
+        self.chosen = set()
+        for (key, (count, inline, placed, inlined, placements)) in groups.items():
+            if count < minimum: continue
+            if smaller and placements + len(placed.flush()) + FORM >= inlined + len(inline.flush()): continue
+            self.chosen.add(key)
+
+    def __call__(self, p, s):
+        if _signature(p, s) not in self.signatures: return None
+        found = shape(p, s)
+        return found if found[0] in self.chosen else None
+
+# PDF FORMS
+class form:
+    '''A piece outline and its style, written once per PDF file as a Form XObject'''
+
+    def __init__(self, canonical, s):
+        (points, closed) = canonical
+        items = [path.moveto_pt(*points[0])] + [path.lineto_pt(*P) for P in points[1:]]
+        self.path   = path.path(*(items + [path.closepath()] if closed else items))
+        self.style  = s
+        self.canvas = canvas.canvas()
+        self.canvas.stroke(self.path, s)
+        self.pdf    = {}    # id(registry) -> _formobject
+
+    def register(self, awriter, registry):
+        if id(registry) not in self.pdf:
+            self.pdf[id(registry)] = _formobject(self, awriter, registry)
+        return self.pdf[id(registry)]
+
+class _formobject(pdfwriter.PDFobject):
+
+    def __init__(self, form, awriter, registry):
+        self.registry = pdfwriter.PDFregistry()
+        self.bbox     = bbox.empty()
+        contentfile   = writer.writer(io.BytesIO())
+        form.canvas.processPDF(contentfile, awriter, pdfwriter.context(), self.registry, self.bbox)
+        self.content  = contentfile.file.getvalue()
+        # Named after what it draws, so that the same figure is the same bytes
+        # whatever forms the process made before (and equal forms are merged).
+        self.name     = "Fm" + hashlib.sha256(self.content).hexdigest()[:12]
+        pdfwriter.PDFobject.__init__(self, "xobject", _id=self.name)
+        registry.add(self)
+        registry.addresource("XObject", self.name, self)
+        registry.mergeregistry(self.registry)
+
+    def write(self, file, awriter, registry):
+        content = zlib.compress(self.content) if awriter.compress else self.content
+        file.write("<<\n"
+                   "/Type /XObject\n"
+                   "/Subtype /Form\n"
+                   "/BBox [%f %f %f %f]\n" % self.bbox.highrestuple_pt())
+        file.write("/Resources ")
+        self.registry.writeresources(file)
+        file.write("/Length %i\n" % len(content))
+        if awriter.compress:
+            file.write("/Filter /FlateDecode\n")
+        file.write(">>\n"
+                   "stream\n")
+        file.write_bytes(content)
+        file.write("endstream\n")
+
+class instance(canvas.canvas):
+    '''One placement of a form (PostScript and SVG output draw it inline)'''
+
+    def __init__(self, form, matrix, p, s):
+        canvas.canvas.__init__(self)
+        canvas.canvas.stroke(self, p, s)
+        self.form  = form
+        self.place = trafo.trafo_pt(*matrix)
+
+    def processPDF(self, file, writer, context, registry, bbox):
+        pdf = self.form.register(writer, registry)
+        file.write("q\n")
+        self.place.processPDF(file, writer, context, registry)
+        file.write("/%s Do\nQ\n" % pdf.name)
+        bbox += pdf.bbox.transformed(self.place)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Batched geometry: w_point, s_point, r_point and flip over arrays of points
+#
+################################################################################
+
+# LIBRARIES
+import numpy as np
+
+# ARRAYS OF POINTS
+# Every function takes points as anything np.asarray() turns into an (..., 2)
+# array (a single (x, y) tuple, a list of them or an array) and broadcasts the
+# remaining arguments against them, so the batched versions accept the same
+# arguments as the scalar helpers of the figures.py scripts.
+
+def points(P):
+    '''Returns P as a float (..., 2) array'''
+
+    return np.asarray(P, dtype=float)
+
+def tuples(P):
+    '''Returns the (..., 2) array P as an (x, y) tuple or a list of them'''
+
+    P = points(P)
+    if P.ndim == 1: return (float(P[0]), float(P[1]))
+    return [(float(x), float(y)) for (x, y) in P.reshape(-1, 2)]
+
+def _weight(W):
+    # Weights and angles broadcast against the leading axes of the points.
+    return np.asarray(W, dtype=float)[..., np.newaxis]
+
+# AUXILIARY FUNCTIONS
+def w_point(x, y, Wx, Wy):
+    '''Weighted average (Wx*x + Wy*y)/(Wx + Wy) of the points x and y'''
+
+    Wx, Wy = _weight(Wx), _weight(Wy)
+    return (Wx*points(x) + Wy*points(y))/(Wx + Wy)
+
+def s_point(x, y, W):
+    '''The point y + W*(y - x), past y along the x->y direction'''
+
+    y = points(y)
+    return _weight(W)*(y - points(x)) + y
+
+def r_point(p, c, A):
+    '''The point p rotated A radians around the centre c'''
+
+    p, c, A = points(p), points(c), np.asarray(A, dtype=float)
+    (dx, dy) = np.moveaxis(p - c, -1, 0)
+    (C, S)   = (np.cos(A), np.sin(A))
+    return c + np.stack([dx*C - dy*S, dx*S + dy*C], axis=-1)
+
+def flip(P, A, B):
+    '''The reflection of P across the line through A and B'''
+
+    P, A, B = points(P), points(A), points(B)
+    M = (A + B)/2.0                             # Midpoint of the A--B segment
+    V = np.stack([A[..., 1] - B[..., 1], B[..., 0] - A[..., 0]], axis=-1)
+    k = np.sum(V*(P - M), axis=-1)/np.sum(V*V, axis=-1)
+    return 2*(M + k[..., np.newaxis]*V) - P     # P + 2*(projection - P)
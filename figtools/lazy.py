@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Lazy figure loading: a cached index of each script and on-demand execution
+#
+################################################################################
+
+# LIBRARIES
+import os
+import re
+import ast
+import json
+import hashlib
+
+from figtools import spec
+
+# CONSTANTS
+VERSION = 3
+INDEX   = os.path.join("figures", ".index.json")
+SPECS   = "specs"   # The folder of the figure specs (see figtools.spec) of a script
+FIGURE  = re.compile(r"^f?figur[ae]\d+[a-z]*$")
+TEXT    = re.compile(r"\bput_text\b|\bcurvedtext\b|\btext\.")
+
+# INDEX
+def _units(source):
+    # One unit per top-level statement: its kind, the names it defines, the
+    # global names it reads, its line span and (for functions) its docstring.
+    units = []
+    for node in ast.parse(source).body:
+        unit = {"names": [], "uses": [], "start": node.lineno, "end": node.end_lineno, "doc": None}
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            unit.update(kind="def", names=[node.name], doc=ast.get_docstring(node))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            unit.update(kind="assign", names=[n.id for t in targets for n in ast.walk(t) if isinstance(n, ast.Name)])
+        elif isinstance(node, ast.If) and "__main__" in ast.dump(node.test):
+            unit.update(kind="main")
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            unit.update(kind="import", names=_modules(node))
+        elif (isinstance(node, ast.Expr) and isinstance(node.value, ast.Call) and
+              isinstance(node.value.func, ast.Attribute) and isinstance(node.value.func.value, ast.Name) and
+              node.value.func.value.id == "text"):
+            unit.update(kind="text")    # text.set() and text.preamble() calls
+        else:
+            unit.update(kind="other")
+        if unit["kind"] in ("def", "assign"):
+            unit["uses"] = sorted({n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)})
+        units.append(unit)
+    return units
+
+def _spec(name, source):
+    # The unit of figure name, written as spec source: the names it reads are
+    # those of its table.
+    try:
+        statements = spec.parse(source)
+    except ValueError as e:
+        raise ValueError("%s, %s" % (os.path.join(SPECS, name + ".spec"), e)) from None
+    return {"kind": "spec", "names": [name], "uses": spec.reads(statements), "start": 1,
+            "end": source.count("\n") + 1, "doc": spec.title(source) or None, "source": source}
+
+def _modules(node):
+    # The modules an import statement may load: "a.b" for import a.b and for
+    # from a import b (which may be a module of package a or a name in it).
+    if isinstance(node, ast.Import): return [alias.name for alias in node.names]
+    if node.level: return []
+    return [node.module] + ["%s.%s" % (node.module, alias.name) for alias in node.names]
+
+def specs(path):
+    '''Returns the sorted [(name, file)] figure specs of the script at path'''
+
+    folder = os.path.join(os.path.dirname(os.path.abspath(path)), SPECS)
+    try:
+        files = os.listdir(folder)
+    except FileNotFoundError:
+        return []
+    return sorted((f[:-len(".spec")], os.path.join(folder, f)) for f in files
+                  if f.endswith(".spec") and FIGURE.match(f[:-len(".spec")]))
+
+_indexes = {}   # path -> (stamps, index) of the scripts seen by this process
+
+def index(path):
+    '''Returns the index of the top-level statements of the script at path
+
+    Parsing a 20,000-line script takes a good fraction of a second, so the
+    index is kept in figures/.index.json and rebuilt only when the source
+    changes. The figure specs of the script follow its statements, as units
+    of kind "spec".'''
+
+    stamps = [(f, os.stat(f).st_mtime_ns, os.stat(f).st_size) for f in [path] + [f for (_, f) in specs(path)]]
+    (seen, data) = _indexes.get(path, (None, None))
+    if seen == stamps: return data
+    data = _index(path)
+    _indexes[path] = (stamps, data)
+    return data
+
+def _index(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f: sha.update(f.read())
+    sources = []
+    for (name, file) in specs(path):
+        with open(file, encoding="utf-8") as f: sources.append((name, f.read()))
+        sha.update(("\0%s\0%s" % sources[-1]).encode("utf-8"))
+    sha   = sha.hexdigest()
+    cache = os.path.join(os.path.dirname(os.path.abspath(path)), INDEX)
+    try:
+        with open(cache, encoding="utf-8") as f: data = json.load(f)
+        if data["version"] == VERSION and data["sha"] == sha: return data
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    with open(path, encoding="utf-8") as f: units = _units(f.read())
+    defined = {n for u in units if u["kind"] in ("def", "assign") for n in u["names"]}
+    for (name, source) in sources:
+        if name in defined: raise ValueError("%s is defined both in %s and in %s" % (name, path, os.path.join(SPECS, name + ".spec")))
+        # Listed among the figure functions, in the order of their names.
+        after = [i for (i, u) in enumerate(units) if u["kind"] == "def" and FIGURE.match(u["names"][0]) and u["names"][0] > name]
+        units.insert(after[0] if after else len(units), _spec(name, source))
+    data = {"version": VERSION, "sha": sha, "units": units}
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        with open(cache + ".%d" % os.getpid(), "w", encoding="utf-8") as f: json.dump(data, f)
+        os.replace(cache + ".%d" % os.getpid(), cache)
+    except OSError:
+        pass
+    return data
+
+_sources = {}   # path -> (index, lines, definitions) for the index in use
+
+def _source(path):
+    data = index(path)
+    if path not in _sources or _sources[path][0] is not data:
+        with open(path, encoding="utf-8") as f: lines = f.read().splitlines(True)
+        _sources[path] = (data, lines, _definitions(data["units"], lines))
+    return _sources[path]
+
+def definitions(path):
+    '''Splits the script at path into its top-level pieces
+
+    Returns (defs, refs, prelude) where defs maps every top-level name to the
+    source of the statements that define it (or of its spec), refs maps it to
+    the global names those statements read and prelude lists the source of
+    everything else (the imports and the text.preamble() calls shared by all
+    figures).'''
+
+    (defs, refs, prelude) = _source(path)[2]
+    return dict(defs), {n: set(r) for (n, r) in refs.items()}, list(prelude)
+
+def _definitions(units, lines):
+    defs    = {}
+    refs    = {}
+    prelude = []
+    for unit in units:
+        segment = unit["source"] if unit["kind"] == "spec" else "".join(lines[unit["start"]-1:unit["end"]])
+        if unit["kind"] == "main": continue
+        if unit["kind"] not in ("def", "assign", "spec"):
+            prelude.append(segment)
+            continue
+        for name in unit["names"]:
+            defs[name] = defs.get(name, "") + segment
+            refs[name] = refs.get(name, set()) | set(unit["uses"])
+    return defs, refs, prelude
+
+def toolkit(path):
+    '''Returns the sha256 of the figtools modules the script at path imports
+
+    They shape the output of the figures (figtools.canvas, figtools.tiling...)
+    so any change to them, or to the figtools modules they import in turn,
+    must count as a change of the figures. figtools.spec counts as imported
+    by the scripts with figure specs.'''
+
+    package = os.path.dirname(os.path.abspath(__file__))
+    units   = index(path)["units"]
+    modules = [m for u in units if u["kind"] == "import" for m in u["names"]]
+    if any(u["kind"] == "spec" for u in units): modules.append("figtools.spec")
+    sources, seen = [], set()
+    while modules:
+        module = modules.pop(0)
+        if module in seen or not module.startswith("figtools."): continue
+        seen.add(module)
+        try:
+            with open(os.path.join(package, module.split(".", 1)[1] + ".py"), encoding="utf-8") as f: source = f.read()
+        except FileNotFoundError:
+            continue    # A name defined in figtools rather than a module
+        sources.append(module + "\0" + source)
+        modules.extend(m for node in ast.walk(ast.parse(source))
+                       if isinstance(node, (ast.Import, ast.ImportFrom)) for m in _modules(node))
+    return hashlib.sha256("\0".join(sorted(sources)).encode("utf-8")).hexdigest()
+
+def closure(defs, refs, name):
+    '''Returns the sorted top-level names that name reaches (itself included)'''
+
+    seen, todo = set(), [name]
+    while todo:
+        n = todo.pop()
+        if n in seen or n not in defs: continue
+        seen.add(n)
+        todo.extend(refs[n])
+    return sorted(seen)
+
+def discover(path):
+    '''Returns a [(name, docstring)] list of the figure functions in path'''
+
+    return [(u["names"][0], u["doc"] or "") for u in index(path)["units"]
+            if u["kind"] in ("def", "spec") and FIGURE.match(u["names"][0])]
+
+# LOADER
+_code  = {}     # (path, source sha, start line) -> compiled statement
+_texts = set()  # scripts whose text setup already ran in this process
+
+def _compile(path, sha, unit, lines):
+    key = (path, sha, unit["start"])
+    if key not in _code:
+        # Blank lines keep the line numbers of tracebacks right.
+        source = "\n"*(unit["start"]-1) + "".join(lines[unit["start"]-1:unit["end"]])
+        _code[key] = compile(source, path, "exec")
+    return _code[key]
+
+def figure(path, name, setup=None):
+    '''Returns the figure function name of the script at path
+
+    Only the imports, the figure itself and the helpers and constants it
+    reaches are executed, in a fresh namespace. The text.set()/preamble()
+    calls run the first time a figure that typesets text is loaded (and then
+    setup() is called), since they start a LaTeX process. A figure spec
+    becomes a function drawing it as figures/NAME over the names it reads.'''
+
+    path  = os.path.abspath(path)
+    (data, lines, (defs, refs, _)) = _source(path)
+    units = data["units"]
+    need  = set(closure(defs, refs, name))
+    if name not in need: raise AttributeError("%s has no figure %s" % (path, name))
+    text  = path not in _texts and any(TEXT.search(defs[n]) for n in need)
+
+    namespace = {"__name__": "figures", "__file__": path}
+    for unit in units:
+        kind = unit["kind"]
+        if kind == "main" or (kind == "text" and not text): continue
+        if kind in ("def", "assign") and need.isdisjoint(unit["names"]): continue
+        if kind == "spec":
+            if name in unit["names"]: namespace[name] = _drawer(name, unit, namespace)
+            continue
+        exec(_compile(path, data["sha"], unit, lines), namespace)
+    if text:
+        _texts.add(path)
+        if setup: setup()
+    return namespace[name]
+
+def _drawer(name, unit, namespace):
+    # The figure function of a spec unit.
+    names = {n: namespace[n] for n in unit["uses"] if n in namespace}
+    return lambda: spec.draw(os.path.join("figures", name), names, unit["source"])
+
+def warm(path, setup=None):
+    '''Runs the imports and the text setup of the script at path ahead of time
+
+    as the first figure that typesets text would (and then calls setup()),
+    so that the next figures find PyX loaded and LaTeX started.'''
+
+    path = os.path.abspath(path)
+    if path in _texts: return
+    (data, lines, _) = _source(path)
+    namespace = {"__name__": "figures", "__file__": path}
+    for unit in data["units"]:
+        if unit["kind"] in ("import", "text"): exec(_compile(path, data["sha"], unit, lines), namespace)
+    _texts.add(path)
+    if setup: setup()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Build manifest: content fingerprints of figure functions and their outputs
+#
+################################################################################
+
+# LIBRARIES
+import os
+import json
+import hashlib
+
+from figtools.lazy import definitions, closure, toolkit
+
+# CONSTANTS
+VERSION  = 2
+MANIFEST = os.path.join("figures", ".manifest.json")
+
+# FINGERPRINTS
+def _sha(data): return hashlib.sha256(data).hexdigest()
+
+def fingerprints(path):
+    '''Returns a {figure: fingerprint} dict for every definition in path
+
+    A fingerprint hashes the source of the definition, of every helper and
+    constant it reaches (w_point, flip, matchstick, BASE, FILLED...), the
+    shared prelude and the figtools modules it imports, so it changes whenever
+    anything the figure uses does.'''
+
+    defs, refs, prelude = definitions(path)
+    prelude = _sha(("".join(prelude) + toolkit(path)).encode("utf-8"))
+    return {name: _sha("\0".join([str(VERSION), prelude] + [defs[n] for n in closure(defs, refs, name)]).encode("utf-8"))
+            for name in defs}
+
+def digest(path):
+    '''Returns the sha256 of the file at path (or None if it does not exist)'''
+
+    try:
+        with open(path, "rb") as f: return _sha(f.read())
+    except FileNotFoundError:
+        return None
+
+# MANIFEST
+class Manifest:
+    '''Fingerprint and output digests of the last successful render of each figure'''
+
+    def __init__(self, root):
+        self.root    = root
+        self.path    = os.path.join(root, MANIFEST)
+        self.entries = {}
+        try:
+            with open(self.path, encoding="utf-8") as f: data = json.load(f)
+            if data.get("version") == VERSION: self.entries = data["figures"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    def fresh(self, name, fingerprint):
+        '''True if name was rendered from fingerprint and its outputs are untouched'''
+
+        entry = self.entries.get(name)
+        return (entry is not None and entry["fingerprint"] == fingerprint and
+                all(digest(os.path.join(self.root, f)) == h for (f, h) in entry["outputs"].items()))
+
+    def update(self, name, fingerprint, outputs):
+        self.entries[name] = {"fingerprint": fingerprint,
+                              "outputs": {f: digest(os.path.join(self.root, f)) for f in outputs}}
+
+    def outputs(self, names):
+        '''Returns the outputs of the figures names, in order'''
+
+        return [f for n in names for f in self.entries.get(n, {}).get("outputs", {})]
+
+    def forget(self, name):
+        self.entries.pop(name, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION, "figures": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
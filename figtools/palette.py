@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Palettes: colour variants of a figure drawn from the same geometry
+#
+################################################################################
+
+# LIBRARIES
+import ast
+
+from pyx import color, deco
+
+from figtools import lazy
+
+# CONSTANTS
+NAME = "PALETTES"   # The {name: {colour: colour}} palettes a figures.py script may define
+
+# COLOURS
+def cmyk(c):
+    '''The colour c in CMYK, for print'''
+
+    return c.cmyk()
+
+def greyscale(c):
+    '''The grey of the same luminance as colour c'''
+
+    return c.grey()
+
+def contrast(c):
+    '''The nearest of black, middle grey and white to the luminance of colour c'''
+
+    return color.grey(round(2*c.grey().g)/2)
+
+BUILTIN = {"cmyk": cmyk, "greyscale": greyscale, "contrast": contrast}
+
+def _value(c):
+    # PyX colours compare by identity, but every script (and every figure the
+    # lazy loader runs) builds its own color.grey(0.10)...
+    return type(c).__name__, tuple(sorted((k, v) for (k, v) in vars(c).items() if k != "exclusiveclass"))
+
+# DOCUMENT PALETTES
+defined = {}    # name -> {colour value: colour} of the script being rendered
+
+def define(palettes):
+    '''Makes the {name: {colour: colour}} palettes of a script available by name
+
+    Colours missing from a palette are kept as they are.'''
+
+    defined.clear()
+    defined.update({name: {_value(a): b for (a, b) in mapping.items()} for (name, mapping) in palettes.items()})
+
+def load(path):
+    '''Defines the PALETTES of the script at path (if it has any)'''
+
+    define(lazy.figure(path, NAME) if NAME in lazy.definitions(path)[0] else {})
+
+def names(path):
+    '''Returns the names of the builtin palettes and of the PALETTES of the script at path'''
+
+    source = lazy.definitions(path)[0].get(NAME, "")
+    keys = [k.value for node in ast.walk(ast.parse(source)) if isinstance(node, ast.Dict)
+            for k in node.keys if isinstance(k, ast.Constant) and isinstance(k.value, str)]
+    return sorted(BUILTIN) + sorted(set(keys) - set(BUILTIN))
+
+def get(name):
+    '''Returns the colour function of palette name'''
+
+    if name in defined:
+        mapping = defined[name]
+        return lambda c: mapping.get(_value(c), c)
+    if name in BUILTIN: return BUILTIN[name]
+    raise KeyError("unknown palette %s (there are %s)" % (name, ", ".join(sorted(set(BUILTIN) | set(defined)))))
+
+# STYLES
+class recolouring:
+    '''Maps the style lists of a figure through the colour function of a palette
+
+    Every style object maps to the same new one, so the strokes that shared
+    a style still share it (and coalesce, and are instanced, as before).'''
+
+    def __init__(self, function):
+        self.function = function
+        self.memo     = {}  # id(attr) -> (attr, its recoloured attr)
+
+    def __call__(self, attrs):
+        return [self.attr(a) for a in attrs]
+
+    def attr(self, a):
+        if id(a) not in self.memo:
+            if isinstance(a, color.color):
+                b = self.function(a)
+            elif type(a) in (type(deco.filled), type(deco.stroked)):
+                styles = self(a.styles)
+                b = a if all(x is y for (x, y) in zip(styles, a.styles)) else type(a)(styles)
+            else:
+                b = a
+            self.memo[id(a)] = (a, b)
+        return self.memo[id(a)][1]
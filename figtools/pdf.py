@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Direct PDF output: the strokes of a figure written without PyX canvas items
+#
+################################################################################
+
+# LIBRARIES
+import io
+
+from pyx import attr, bbox, deco, document, path, pdfwriter, style, trafo, unit
+
+# CONSTANTS
+WRITE = {"title", "author", "subject", "keywords", "fullscreen", "writebbox", "compress", "compresslevel", "stripfonts"}
+
+# STYLES
+# The entries drawn here are the strokes of figtools.canvas (the (path, style)
+# pairs of the drawing lists, coalesced) and the placements of its forms. A
+# stroke has to be made of plain styles (widths, dashes, colours, even
+# transparencies) and at most a deco.filled of plain styles: arrows, curved
+# text and deformers need the PyX canvas to draw them.
+
+def _plain(s):
+    for a in s:
+        if isinstance(a, style.style): continue
+        if type(a) is type(deco.filled) and all(isinstance(b, style.style) for b in a.styles): continue
+        return False
+    return True
+
+def subpaths(p):
+    '''Returns the subpaths of path p as (points, closed) pairs
+
+    or None unless p is made of moveto, lineto... (closepath) subpaths.'''
+
+    items = p.pathitems
+    (result, i) = ([], 0)
+    while i < len(items):
+        if not isinstance(items[i], path.moveto_pt): return None
+        points = [(items[i].x_pt, items[i].y_pt)]
+        i += 1
+        while i < len(items) and type(items[i]) in (path.lineto, path.lineto_pt):
+            points.append((items[i].x_pt, items[i].y_pt))
+            i += 1
+        if len(points) < 2: return None
+        closed = i < len(items) and isinstance(items[i], path.closepath)
+        result.append((points, closed))
+        i += closed
+    return result
+
+def stylekey(s):
+    '''Returns a key shared by the style lists s made of the same style objects'''
+
+    # FILLED() wraps the shared colour constants in a new deco.filled each time.
+    return tuple(id(a) if isinstance(a, style.style) else tuple(id(b) for b in a.styles) for a in s)
+
+def supported(drawing):
+    '''Returns whether the strokes of the (path, style) list drawing can be written here'''
+
+    return all(isinstance(p, path.path) and _plain(s) for (p, s) in drawing)
+
+# CONTENT
+class page:
+    '''A PDF page drawing the (path, style, placed) entries of figtools.canvas
+
+    placed is None for the strokes and the (form, matrix) of the forms.form to
+    draw in their place otherwise. It stands for a pyx.document.page for the
+    PyX PDF writer, which writes the objects of the file around its content:
+    the content and the bounding box are the ones the PyX canvas would give
+    (the MediaBox is the bounding box of the paths enlarged by bboxenlarge or
+    by half the linewidth of their strokes, whichever is wider).'''
+
+    paperformat = None
+    rotated     = False
+
+    def __init__(self, entries, bboxenlarge=1*unit.t_pt):
+        self.entries     = entries
+        self.bboxenlarge = bboxenlarge
+
+    def processPDF(self, file, writer, context, registry, pagebbox):
+        style.linewidth.normal.processPDF(file, writer, context, registry)
+        enlarge = unit.topt(self.bboxenlarge)
+        # The style lists are kept with their compiled styles, so that their ids
+        # (the style keys) are not reused while the entries stream by.
+        (styles, out, box) = ({}, io.StringIO(), bounds())
+        for (p, s, placed) in self.entries:
+            polygon = subpaths(p)
+            (llx, lly, urx, ury) = extent(p, polygon)
+            box.add(llx-enlarge, lly-enlarge, urx+enlarge, ury+enlarge)
+            if placed is not None:
+                (form, matrix) = placed
+                pdf   = form.register(writer, registry)
+                place = trafo.trafo_pt(*matrix)
+                out.write("q\n")
+                place.processPDF(out, writer, context, registry)
+                out.write("/%s Do\nQ\n" % pdf.name)
+                b = pdf.bbox.transformed(place)
+                box.add(b.llx_pt, b.lly_pt, b.urx_pt, b.ury_pt)
+                continue
+            key = stylekey(s)
+            if key not in styles: styles[key] = (s, _styles(s, writer, context, registry))
+            (head, tail, width) = styles[key][1]
+            out.write(head)
+            _path(out, p, polygon, writer)
+            out.write(tail)
+            box.add(llx-width, lly-width, urx+width, ury+width)
+        file.write(out.getvalue())
+        if box: pagebbox += bbox.bbox_pt(*box.box)
+
+def _styles(s, writer, context, registry):
+    # The operators written before and after the path of a stroke with
+    # style s, and the half linewidth it adds to the bounding box, as in
+    # pyx.deco.decoratedpath.processPDF().
+    attrs = attr.mergeattrs([deco.stroked] + list(s))
+    styles = attr.getattrs(attrs, [style.style])
+    (stroke, fill) = (None, None)
+    for a in attr.getattrs(attrs, [deco.deco]):
+        if type(a) is type(deco.stroked): stroke = a.styles
+        if type(a) is type(deco.filled):  fill   = a.styles
+    (head, tail) = (io.StringIO(), io.StringIO())
+    if styles:
+        head.write("q\n")
+        context = context()
+        for a in styles: a.processPDF(head, writer, context, registry)
+    acontext = context()
+    if fill is not None:
+        tail.write("q\n")
+        acontext.strokeattr = 0
+        for a in fill: a.processPDF(tail, writer, acontext, registry)
+        acontext.strokeattr = 1
+        acontext.fillattr = 0
+        for a in stroke: a.processPDF(tail, writer, acontext, registry)
+        acontext.fillattr = 1
+        tail.write("B*\nQ\n" if context.fillrule else "B\nQ\n")
+    else:
+        if stroke:
+            head.write("q\n")
+            acontext.fillattr = 0
+            for a in stroke: a.processPDF(head, writer, acontext, registry)
+            acontext.fillattr = 1
+        tail.write("S\nQ\n" if stroke else "S\n")
+    if styles: tail.write("Q\n")
+    return head.getvalue(), tail.getvalue(), 0.5*acontext.linewidth_pt
+
+def extent(p, subpaths):
+    '''Returns the (llx, lly, urx, ury) bounding box in pt of path p
+
+    subpaths are the subpaths(p), which are faster to bound than p.'''
+
+    if subpaths is None:
+        b = p.bbox()
+        return b.llx_pt, b.lly_pt, b.urx_pt, b.ury_pt
+    xs = [x for (points, _) in subpaths for (x, _) in points]
+    ys = [y for (points, _) in subpaths for (_, y) in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+class bounds:
+    '''The bounding box of the (llx, lly, urx, ury) boxes added to it
+
+    It holds the box alone, so the entries it bounds may stream by.'''
+
+    def __init__(self):
+        self.box = None
+
+    def add(self, llx, lly, urx, ury):
+        if self.box is None: self.box = [llx, lly, urx, ury]
+        else: self.box = [min(self.box[0], llx), min(self.box[1], lly), max(self.box[2], urx), max(self.box[3], ury)]
+
+    def __bool__(self): return self.box is not None
+
+def _path(out, p, subpaths, writer):
+    if subpaths is None:
+        p.outputPDF(out, writer)
+        return
+    for (points, closed) in subpaths:
+        out.write("%f %f m\n" % points[0])
+        out.write("".join("%f %f l\n" % P for P in points[1:]))
+        if closed: out.write("h\n")
+
+# OUTPUT
+def options(kwargs):
+    '''Returns the (page, writer) keyword arguments of a writePDFfile() call
+
+    or None when it asks for anything but a bboxenlarge or the PDF writer
+    options above (a paper format, a page trafo...), which only PyX handles.'''
+
+    (page, writer) = ({}, {})
+    for (key, value) in kwargs.items():
+        if key == "page_bboxenlarge": page["bboxenlarge"] = value
+        elif key.startswith("write_") and key[6:] in WRITE: writer[key[6:]] = value
+        else: return None
+    return page, writer
+
+def write(entries, file=None, **kwargs):
+    '''Writes the (path, style, placed) entries as a one-page PDF file
+
+    file and kwargs are those of pyx.canvas.canvas.writePDFfile().'''
+
+    (pagekwargs, writerkwargs) = options(kwargs)
+    with document._outputstream(file, "pdf") as f:
+        pdfwriter.PDFwriter(document.document([page(entries, **pagekwargs)]), f, **writerkwargs)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Per-figure profile: time, memory, drawing primitives and output size
+#
+################################################################################
+
+# LIBRARIES
+import os
+import csv
+import json
+import time
+import resource
+
+# CONSTANTS
+FIELDS = ["name", "wall", "cpu", "rss", "paths", "items", "bytes"]
+
+# PROBE
+class Probe:
+    '''Measures the figures rendered by one worker, one at a time
+
+    Counts every path the figure strokes, fills, draws or streams on a
+    figtools canvas (as it is given, before coalescing and whichever writer
+    writes it out) together with its path items, and resets the peak RSS of
+    the process between figures where the kernel allows it (Linux).'''
+
+    def __init__(self):
+        from figtools import canvas
+        self.paths = 0
+        self.items = 0
+        def counted(method):
+            # The canvas strokes and draws the coalesced paths unlogged.
+            def counting(c, path, *args):
+                if c.logging:
+                    self.paths += 1
+                    self.items += len(getattr(path, "pathitems", ()))
+                return method(c, path, *args)
+            return counting
+        def streamed(method):
+            # The streamed strokes are counted once, as they are given, however
+            # many times the writers make them again.
+            def counting(c, source):
+                if c.logging:
+                    for (path, _) in source():
+                        self.paths += 1
+                        self.items += len(getattr(path, "pathitems", ()))
+                return method(c, source)
+            return counting
+        canvas.canvas.stroke = counted(canvas.canvas.stroke)
+        canvas.canvas.draw   = counted(canvas.canvas.draw)
+        canvas.canvas.stream = streamed(canvas.canvas.stream)
+
+    @staticmethod
+    def _reset_rss():
+        try:
+            with open("/proc/self/clear_refs", "w") as f: f.write("5")
+        except OSError:
+            pass
+
+    @staticmethod
+    def _peak_rss():
+        # Peak resident set size in KiB (VmHWM honours the reset above).
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"): return int(line.split()[1])
+        except OSError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def start(self):
+        self.paths = self.items = 0
+        self._reset_rss()
+        self.wall = time.perf_counter()
+        self.cpu  = time.process_time()
+
+    def stop(self, name, outputs):
+        return {"name":  name,
+                "wall":  time.perf_counter() - self.wall,
+                "cpu":   time.process_time() - self.cpu,
+                "rss":   self._peak_rss(),
+                "paths": self.paths,
+                "items": self.items,
+                "bytes": sum(os.path.getsize(f) for f in outputs if os.path.exists(f))}
+
+# REPORTS
+def write(profiles, basename):
+    '''Writes the profiles to basename.json and basename.csv'''
+
+    with open(basename + ".json", "w", encoding="utf-8") as f:
+        json.dump(profiles, f, indent=1)
+    with open(basename + ".csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(profiles)
+
+def summary(profiles, top=10, key="wall"):
+    '''Returns the lines of a table with the top figures sorted by key'''
+
+    lines = ["%-16s %8s %8s %9s %8s %9s %10s" % ("figure", "wall(s)", "cpu(s)", "rss(KiB)", "paths", "items", "bytes")]
+    for p in sorted(profiles, key=lambda p: p[key], reverse=True)[:top]:
+        lines.append("%-16s %8.3f %8.3f %9d %8d %9d %10d" % tuple(p[f] for f in FIELDS))
+    return lines
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Thumbnails: the strokes of a figure rasterised by an anti-aliased scanline fill
+#
+################################################################################
+
+# LIBRARIES
+import zlib
+import shutil
+import struct
+import subprocess
+from math import ceil, hypot
+
+import numpy as np
+
+from pyx import document, unit
+
+from figtools.pdf import bounds, extent, stylekey, subpaths
+from figtools.svg import attributes
+
+# CONSTANTS
+SIZE    = 256   # Width or height (whichever is larger) of a thumbnail in pixels
+SAMPLES = 5     # Scanlines per row of pixels (the coverage along x is exact)
+ROUND   = 12    # Sides of the polygons drawn for round caps and joins
+CURVE   = 8     # Segments drawn for every Bezier curve of a path
+
+# SCANLINE FILL
+def coverage(polygons, width, height, samples=SAMPLES):
+    '''Returns the (height, width) array of the area of every pixel inside the polygons
+
+    polygons are (n, 2) arrays of vertices in pixels (y pointing down) which
+    are filled together with the nonzero winding rule, as PDF fills the
+    subpaths of a path. Every row of pixels is sampled by several scanlines
+    and the area of each span is added exactly along x.'''
+
+    (x0, y0, x1, y1) = ([], [], [], [])
+    for P in polygons:
+        if len(P) < 3: continue
+        Q = np.roll(P, -1, axis=0)
+        (x0, y0, x1, y1) = (x0 + [P[:, 0]], y0 + [P[:, 1]], x1 + [Q[:, 0]], y1 + [Q[:, 1]])
+    cover = np.zeros((height, width))
+    if not x0: return cover
+    (x0, y0, x1, y1) = (np.concatenate(x0), np.concatenate(y0), np.concatenate(x1), np.concatenate(y1))
+    keep = y0 != y1
+    (x0, y0, x1, y1) = (x0[keep], y0[keep], x1[keep], y1[keep])
+    direction = np.where(y1 > y0, 1, -1)
+
+    # Scanline k runs at y = (k + 0.5)/samples and meets the edges with
+    # min(y0, y1) <= y < max(y0, y1).
+    lines = height*samples
+    first = np.clip(np.ceil(np.minimum(y0, y1)*samples - 0.5), 0, lines).astype(np.int64)
+    last  = np.clip(np.ceil(np.maximum(y0, y1)*samples - 0.5), 0, lines).astype(np.int64)
+    count = last - first
+    edge  = np.repeat(np.arange(len(count)), count)
+    k     = first[edge] + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    y     = (k + 0.5)/samples
+    x     = x0[edge] + (y - y0[edge])*(x1[edge] - x0[edge])/(y1[edge] - y0[edge])
+
+    # Every scanline crosses the closed polygons as many times upwards as
+    # downwards, so a running sum of the crossings sorted by (k, x) is the
+    # winding number of each span, scanline after scanline.
+    order   = np.lexsort((x, k))
+    (k, x)  = (k[order], x[order])
+    winding = np.cumsum(direction[edge][order])
+    before  = winding - direction[edge][order]
+    (start, end) = (x[(before == 0) & (winding != 0)], x[(before != 0) & (winding == 0)])
+    row = k[(before == 0) & (winding != 0)]//samples
+
+    # Each span adds 1/samples to the pixels it covers and its fraction to the
+    # pixels at its ends, through a difference array summed along the rows.
+    (start, end) = (np.clip(start, 0, width), np.clip(end, 0, width))
+    diff = np.zeros((height, width + 2))
+    for (X, sign) in ((start, 1.0), (end, -1.0)):
+        i = np.floor(X).astype(np.int64)
+        f = X - i
+        np.add.at(diff, (row, i), sign*(1 - f)/samples)
+        np.add.at(diff, (row, i + 1), sign*f/samples)
+    np.cumsum(diff, axis=1, out=diff)
+    return np.clip(diff[:, :width], 0, 1)
+
+# STROKES
+# Every polygon below turns the same way (counterclockwise with y pointing up),
+# so that the nonzero winding rule adds them up where they overlap.
+_CIRCLE = np.stack([np.cos(np.linspace(0, 2*np.pi, ROUND, endpoint=False)),
+                    np.sin(np.linspace(0, 2*np.pi, ROUND, endpoint=False))], axis=-1)
+
+def _disc(C, r):
+    return np.asarray(C) + r*_CIRCLE
+
+def _square(C, r):
+    return np.array([(C[0]-r, C[1]-r), (C[0]+r, C[1]-r), (C[0]+r, C[1]+r), (C[0]-r, C[1]+r)])
+
+def _quad(P, Q, r, before=0, after=0):
+    (dx, dy) = (Q[0] - P[0], Q[1] - P[1])
+    length = hypot(dx, dy)
+    if not length: return None
+    (ux, uy) = (dx/length, dy/length)
+    (P, Q) = ((P[0] - before*ux, P[1] - before*uy), (Q[0] + after*ux, Q[1] + after*uy))
+    (nx, ny) = (-uy*r, ux*r)
+    return np.array([(P[0]-nx, P[1]-ny), (Q[0]-nx, Q[1]-ny), (Q[0]+nx, Q[1]+ny), (P[0]+nx, P[1]+ny)])
+
+def _dashes(points, closed, pattern, offset):
+    # Splits the polyline into the (points, closed) polylines of its dashes.
+    if closed: points = points + points[:1]
+    if not any(pattern): return [(points, closed)]
+    (i, left, phase) = (0, pattern[0], offset % sum(pattern))
+    while phase > 0:
+        if phase < left:
+            (left, phase) = (left - phase, 0)
+        else:
+            phase -= left
+            i = (i + 1) % len(pattern)
+            left = pattern[i]
+    pieces  = []
+    current = [points[0]] if i % 2 == 0 else None
+    for (P, Q) in zip(points, points[1:]):
+        (length, done) = (hypot(Q[0] - P[0], Q[1] - P[1]), 0.0)
+        while length - done >= left:
+            done += left
+            t = done/length if length else 0.0
+            X = (P[0] + t*(Q[0] - P[0]), P[1] + t*(Q[1] - P[1]))
+            if current is not None:
+                pieces.append((current + [X], False))
+                current = None
+            else:
+                current = [X]
+            i = (i + 1) % len(pattern)
+            left = pattern[i]
+        left -= length - done
+        if current is not None: current.append(Q)
+    if current is not None: pieces.append((current, False))
+    return pieces
+
+def outline(points, closed, width, cap="butt", pattern=(), offset=0):
+    '''Returns the polygons that cover the stroke of a polyline
+
+    points are in pixels, width is the linewidth and pattern and offset those
+    of its dashes, also in pixels. Joins are round, which a thumbnail cannot
+    tell from the miter joins of most figures.'''
+
+    r = width/2
+    polygons = []
+    for (piece, whole) in _dashes(list(points), closed, list(pattern), offset):
+        if all(P == piece[0] for P in piece):
+            # Zero length dashes, as in dotted lines, are drawn by their caps.
+            if cap == "round":  polygons.append(_disc(piece[0], r))
+            if cap == "square": polygons.append(_square(piece[0], r))
+            continue
+        extend = r if cap == "square" and not whole else 0
+        segments = list(zip(piece, piece[1:]))
+        for (j, (P, Q)) in enumerate(segments):
+            quad = _quad(P, Q, r, extend if j == 0 else 0, extend if j == len(segments)-1 else 0)
+            if quad is not None: polygons.append(quad)
+        for P in (piece if whole else piece[1:-1]):
+            polygons.append(_disc(P, r))
+        if cap == "round" and not whole:
+            polygons.extend([_disc(piece[0], r), _disc(piece[-1], r)])
+    return polygons
+
+def _flatten(p, polygon):
+    # The (points, closed) subpaths of path p, with its curves drawn by
+    # segments, given its subpaths(p).
+    if polygon is not None: return polygon
+    result = []
+    for sub in p.normpath().normsubpaths:
+        points = [sub.atbegin_pt()]
+        for item in sub.normsubpathitems:
+            if hasattr(item, "x3_pt"):
+                points.extend((item.x_pt(t), item.y_pt(t)) for t in np.linspace(0, 1, CURVE + 1)[1:])
+            else:
+                points.append(item.atend_pt())
+        result.append((points, bool(sub.closed)))
+    return result
+
+# COLOURS
+def _colour(name):
+    if name in (None, "none"): return None
+    if name == "black": return (0.0, 0.0, 0.0)
+    if name == "white": return (1.0, 1.0, 1.0)
+    digits = name.lstrip("#")
+    if len(digits) == 3: digits = "".join(c*2 for c in digits)
+    return tuple(int(digits[i:i+2], 16)/255 for i in (0, 2, 4))
+
+def _paint(s):
+    # The (colour, opacity) of the fill and of the stroke of a path with style
+    # s, and its linewidth, linecap and dashes (in pt).
+    (elements, width) = attributes(s)
+    (fill, stroke) = (None, None)
+    for e in elements:
+        opacity = float(e.get("opacity", 1))
+        if _colour(e.get("fill")) is not None:   fill   = (_colour(e["fill"]), opacity)
+        if _colour(e.get("stroke")) is not None: stroke = (_colour(e["stroke"]), opacity)
+    e = elements[0]
+    dashes = e.get("stroke-dasharray", "none")
+    pattern = [] if dashes == "none" else [float(d) for d in dashes.split()]
+    return fill, stroke, 2*width, e.get("stroke-linecap", "butt"), pattern, float(e.get("stroke-dashoffset", 0))
+
+# OUTPUT
+def render(entries, size=SIZE, bboxenlarge=1*unit.t_pt):
+    '''Returns the (height, width, 4) RGBA array of the (path, style, placed) entries
+
+    The figure is scaled so that the larger side of its bounding box (the
+    one of its PDF file) spans size pixels. Every stroke is filled and then
+    stroked, in order, over a transparent background.'''
+
+    (paints, box, enlarge) = ({}, bounds(), unit.topt(bboxenlarge))
+    def paint_of(s):
+        # The style lists are kept, so that their ids (the style keys) are
+        # not reused while the entries stream by.
+        key = stylekey(s)
+        if key not in paints: paints[key] = (s, _paint(s))
+        return paints[key][1]
+
+    # The scale depends on the bounding box, so the entries are gone through
+    # twice (streamed strokes are made again).
+    for (p, s, _) in entries:
+        (llx, lly, urx, ury) = extent(p, subpaths(p))
+        w = max(enlarge, paint_of(s)[2]/2)
+        box.add(llx-w, lly-w, urx+w, ury+w)
+    (llx, lly, urx, ury) = box.box
+    scale  = size/max(urx - llx, ury - lly)
+    (W, H) = (max(1, ceil((urx - llx)*scale)), max(1, ceil((ury - lly)*scale)))
+
+    # Premultiplied colour and alpha, painted over with each coverage.
+    (colour, alpha) = (np.zeros((H, W, 3)), np.zeros((H, W)))
+    def paint(cover, rgb, opacity):
+        # Only the rows and columns the coverage reaches are painted over.
+        (rows, columns) = (np.flatnonzero(cover.any(axis=1)), np.flatnonzero(cover.any(axis=0)))
+        if not len(rows): return
+        window = (slice(rows[0], rows[-1] + 1), slice(columns[0], columns[-1] + 1))
+        a = cover[window]*opacity
+        colour[window] = colour[window]*(1 - a)[..., np.newaxis] + a[..., np.newaxis]*np.array(rgb)
+        alpha[window]  = alpha[window]*(1 - a) + a
+    for (p, s, _) in entries:
+        (fill, stroke, width, cap, pattern, offset) = paint_of(s)
+        polygon = _flatten(p, subpaths(p))
+        pixels = [([((x - llx)*scale, (ury - y)*scale) for (x, y) in points], closed) for (points, closed) in polygon]
+        if fill is not None:
+            paint(coverage([np.array(points) for (points, _) in pixels], W, H), *fill)
+        if stroke is not None:
+            polygons = [P for (points, closed) in pixels
+                        for P in outline(points, closed, width*scale, cap, [d*scale for d in pattern], offset*scale)]
+            paint(coverage(polygons, W, H), *stroke)
+    rgba = np.empty((H, W, 4))
+    rgba[..., :3] = np.divide(colour, alpha[..., np.newaxis], out=np.zeros_like(colour), where=alpha[..., np.newaxis] > 0)
+    rgba[..., 3]  = alpha
+    return rgba
+
+def png(rgba):
+    '''Returns the bytes of the PNG image of the (height, width, 4) RGBA array'''
+
+    pixels = np.round(np.clip(rgba, 0, 1)*255).astype(np.uint8)
+    (H, W) = pixels.shape[:2]
+    rows = np.concatenate([np.zeros((H, 1), np.uint8), pixels.reshape(H, W*4)], axis=1)
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", W, H, 8, 6, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(rows.tobytes())) + chunk(b"IEND", b""))
+
+def ghostscript(file, resolution):
+    '''Returns the bytes of the PNG image of the PDF file at resolution dpi
+
+    It is the fallback for the figures that figtools.raster cannot draw.'''
+
+    gs = shutil.which("gs")
+    if gs is None: raise RuntimeError("ghostscript (gs) is needed to rasterise " + file)
+    return subprocess.run([gs, "-q", "-dSAFER", "-dBATCH", "-dNOPAUSE", "-sDEVICE=pngalpha",
+                           "-dTextAlphaBits=4", "-dGraphicsAlphaBits=4", "-r%g" % resolution,
+                           "-sOutputFile=-", file], check=True, stdout=subprocess.PIPE).stdout
+
+def write(entries, file=None, size=SIZE, bboxenlarge=1*unit.t_pt):
+    '''Writes the PNG thumbnail of the (path, style, placed) entries'''
+
+    data = png(render(entries, size, bboxenlarge))
+    with document._outputstream(file, "png") as f: f.write(data)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Shared figure registry: figures keyed by content across all the documents
+#
+################################################################################
+
+# LIBRARIES
+import os
+import re
+import sys
+import json
+import glob
+import shutil
+import hashlib
+import argparse
+import tempfile
+from collections import defaultdict
+
+from figtools.lazy import FIGURE, TEXT, closure, definitions, figure, toolkit
+from figtools.runner import run
+
+# CONSTANTS
+VERSION   = 2
+ROOT      = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+DIRECTORY = os.environ.get("FIGTOOLS_FIGCACHE") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache")), "figtools", "figures")
+SELF      = "{figure}"  # Stands for the figure's own name in keys and cached outputs
+RANDOM    = re.compile(r"\b(random|uniform|randint|randrange|choice|choices|shuffle|sample|gauss)\(")
+
+# CONTENT KEYS
+def keys(path):
+    '''Returns a {figure: key} dict for the figure functions of path
+
+    Unlike the manifest fingerprints, keys ignore the figure's own name (so
+    the same drawing under another name or in another document shares its
+    key), the import lines and, for figures that typeset no text, the LaTeX
+    preamble. They still cover every helper and constant the figure uses and
+    the figtools modules the script imports, and the name of the figures that
+    draw random numbers (from the figtools.runner.seed() of their name).'''
+
+    defs, refs, prelude = definitions(path)
+    tools    = toolkit(path)
+    preamble = "".join(s for s in prelude if not s.lstrip().startswith(("import ", "from ")))
+    result   = {}
+    for name in defs:
+        if not FIGURE.match(name): continue
+        own    = re.compile(r"\b%s(?![0-9a-z])" % name)
+        source = [own.sub(SELF, defs[n]) for n in closure(defs, refs, name)]
+        typeset = any(TEXT.search(s) for s in source)
+        drawn   = any(RANDOM.search(s) for s in source)
+        result[name] = hashlib.sha256("\0".join([str(VERSION), tools, preamble if typeset else "", name if drawn else ""]
+                                                + source).encode("utf-8")).hexdigest()
+    return result
+
+def documents(root=ROOT):
+    '''Returns the figures.py scripts of every document folder that Python 3 parses'''
+
+    scripts = []
+    for path in sorted(glob.glob(os.path.join(root, "*", "figures.py"))):
+        try:
+            with open(path, encoding="utf-8") as f: compile(f.read(), path, "exec")
+            scripts.append(path)
+        except SyntaxError:
+            pass    # The Python 2 scripts (Diari de Disseny, Parlem, Printable Edition)
+    return scripts
+
+# REGISTRY
+class Registry:
+    '''Every figure of every document, grouped by content key'''
+
+    def __init__(self, scripts=None):
+        self.scripts = documents() if scripts is None else scripts
+        self.figures = defaultdict(list)    # key -> [(script, name)]
+        for script in self.scripts:
+            for (name, key) in keys(script).items(): self.figures[key].append((script, name))
+
+    def __len__(self): return len(self.figures)
+
+    def lookup(self, name):
+        '''Returns the keys of the figures called name (in any document)'''
+
+        return [k for (k, places) in self.figures.items() if any(n == name for (_, n) in places)]
+
+    def load(self, key):
+        '''Returns the figure function with the given key (from its first document)'''
+
+        (script, name) = self.figures[key][0]
+        return figure(script, name)
+
+# SHARED OUTPUT CACHE
+def _entry(key, directory): return os.path.join(directory, key[:2], key)
+
+def restore(key, name, root, directory=DIRECTORY):
+    '''Copies the cached outputs of key into the document at root as figure name
+
+    Returns the list of restored outputs, or None if key was never stored.'''
+
+    entry = _entry(key, directory)
+    try:
+        with open(os.path.join(entry, "outputs.json"), encoding="utf-8") as f: outputs = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    restored = []
+    for (i, output) in enumerate(outputs):
+        target = output.replace(SELF, name)
+        os.makedirs(os.path.dirname(os.path.join(root, target)), exist_ok=True)
+        # Copied under another name first, as the runner writes its outputs.
+        scratch = os.path.join(root, "%s.%d.part" % (target, os.getpid()))
+        shutil.copyfile(os.path.join(entry, str(i)), scratch)
+        os.replace(scratch, os.path.join(root, target))
+        restored.append(target)
+    return restored
+
+def store(key, name, root, outputs, directory=DIRECTORY):
+    '''Adds the outputs rendered by figure name (in the document at root) to the cache'''
+
+    entry = _entry(key, directory)
+    if os.path.isdir(entry): return
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    scratch = tempfile.mkdtemp(dir=os.path.dirname(entry))
+    for (i, output) in enumerate(outputs):
+        shutil.copyfile(os.path.join(root, output), os.path.join(scratch, str(i)))
+    with open(os.path.join(scratch, "outputs.json"), "w", encoding="utf-8") as f:
+        json.dump([o.replace(name, SELF) for o in outputs], f)
+    try:
+        os.rename(scratch, entry)
+    except OSError:
+        shutil.rmtree(scratch)  # Another build stored the same key first
+
+# MAIN
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m figtools.registry",
+                                description="Figures shared by the documents, and a deduplicated build of all of them")
+    p.add_argument("-b", "--build", action="store_true", help="build the figures of every document")
+    p.add_argument("-j", "--jobs",  type=int, metavar="N", help="number of worker processes (default: all cores)")
+    args = p.parse_args(argv)
+
+    registry = Registry()
+    total    = sum(len(places) for places in registry.figures.values())
+    print("%d figures in %d documents, %d distinct" % (total, len(registry.scripts), len(registry)))
+    for script in registry.scripts:
+        own = sum(1 for places in registry.figures.values() if places[0][0] == script)
+        print("  %-48s %4d distinct figures first defined here" % (os.path.basename(os.path.dirname(script)), own))
+    if not args.build: return 0
+
+    status = 0
+    for script in registry.scripts:
+        print("\n" + os.path.basename(os.path.dirname(script)))
+        results = list(run(script, jobs=args.jobs))
+        shared  = sum(1 for r in results if r.shared)
+        failed  = [r.name for r in results if not r.ok]
+        print("%d figures rendered, %d taken from the shared cache, %d failed"
+              % (len(results)-shared-len(failed), shared, len(failed)))
+        if failed: status = 1
+    return status
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
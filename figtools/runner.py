@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Parallel figure runner: renders every figureNNN() of a figures.py script
+#
+################################################################################
+
+# LIBRARIES
+import io
+import os
+import sys
+import time
+import random
+import hashlib
+import traceback
+import multiprocessing
+from contextlib import contextmanager, nullcontext
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from figtools import lazy
+from figtools.lazy import discover
+from figtools.manifest import Manifest, fingerprints
+
+# CONSTANTS
+# Outcome of rendering one figure (tex holds the worker's TeX counters, profile
+# the figtools.profile measures when asked for, and shared figures were copied
+# from the figtools.registry cache instead of being rendered)
+Result = namedtuple("Result", "name ok error seconds outputs tex profile shared", defaults=(False,))
+EPOCH  = "0"    # SOURCE_DATE_EPOCH of the figures: the PyX /CreationDate of every PDF file
+
+# WORKERS
+_path    = None
+_warm    = None
+_cache   = None
+_probe   = None
+_outputs = []
+
+class _replacing(io.BufferedWriter):
+    # A file written under a temporary name and moved over its own when it is
+    # closed, so that a pdflatex pass of figtools.build running meanwhile
+    # reads either the old figure or the new one, never half of it.
+    def __init__(self, path):
+        self.target = path
+        super().__init__(io.FileIO("%s.%d.part" % (path, os.getpid()), "wb"))
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None: return super().__exit__(kind, value, traceback)
+        super().close()
+        os.remove(self.name)
+
+    def close(self):
+        if self.closed: return
+        super().close()
+        os.replace(self.name, self.target)
+
+def _record(stream):
+    # Wraps pyx.document._outputstream, through which every write*file() opens
+    # its output, to learn which files each figure writes.
+    def outputstream(file, suffix):
+        if not isinstance(file, str): return stream(file, suffix)
+        path = file if file.endswith("." + suffix) else "%s.%s" % (file, suffix)
+        _outputs.append(os.path.normpath(path))
+        return _replacing(path)
+    return outputstream
+
+def _init(path, profile=False, formats=("pdf",), symbols=False, thumbnail=None, palettes=(), atlas=False, warm=False):
+    global _path, _probe
+    from pyx import document
+    from figtools import canvas
+    document._outputstream = _record(document._outputstream)
+    (canvas.canvas.formats, canvas.canvas.symbols) = (tuple(formats), symbols)
+    if thumbnail: canvas.canvas.thumbnail = thumbnail
+    if atlas: canvas.canvas.stripfonts = False
+    if palettes:
+        from figtools import palette
+        canvas.canvas.palettes = tuple(palettes)
+        palette.load(path)
+    os.chdir(os.path.dirname(os.path.abspath(path)))
+    os.environ["SOURCE_DATE_EPOCH"] = EPOCH
+    _path = path
+    if profile:
+        from figtools.profile import Probe
+        _probe = Probe()
+    if warm:
+        try:
+            lazy.warm(path, _text)
+        except Exception:
+            pass    # The figures that need LaTeX will report it
+
+def _text():
+    # Runs after the first figure that typesets text set up the LaTeX engine.
+    global _warm, _cache
+    from figtools import texcache, texpool
+    _warm  = texpool.install()
+    _cache = texcache.install()
+
+def _tex():
+    (pid, starts, texts) = _warm.stats() if _warm else (os.getpid(), 0, 0)
+    return (pid, starts, texts) + ((_cache.hits, _cache.misses) if _cache else (0, 0))
+
+def seed(name):
+    '''Returns the random seed of figure name
+
+    Every figure starts from its own seed, so the ones that draw random
+    numbers without calling seed() get the same numbers wherever, and after
+    whichever other figures, they are rendered.'''
+
+    return int.from_bytes(hashlib.sha256(name.encode("utf-8")).digest()[:8], "big")
+
+def _render(name):
+    del _outputs[:]
+    random.seed(seed(name))
+    if _probe: _probe.start()
+    start = time.perf_counter()
+    try:
+        lazy.figure(_path, name, _text)()
+        ok, error = True, None
+    except Exception:
+        ok, error = False, traceback.format_exc()
+    seconds = time.perf_counter()-start
+    profile = _probe.stop(name, _outputs) if _probe else None
+    return Result(name, ok, error, seconds, list(_outputs), _tex(), profile)
+
+def _pid(_): return os.getpid()
+
+@contextmanager
+def _detached():
+    # Spawned workers re-run the __main__ script (as __mp_main__) before doing
+    # anything else, which for a figures.py script means executing all of it.
+    # They only need figtools, so the script is hidden while they start.
+    main = sys.modules["__main__"]
+    path = main.__dict__.pop("__file__", None)
+    try:
+        yield
+    finally:
+        if path is not None: main.__file__ = path
+
+# RUNNER
+def _variant(hashes, formats, symbols, thumbnail=None, palettes=(), document="", atlas=False):
+    # Figures written in other formats than the PDF alone, in palettes or
+    # for an atlas are other builds, with their own fingerprints and keys.
+    # document is the fingerprint of the PALETTES of the script.
+    if tuple(formats) == ("pdf",) and not palettes and not atlas: return hashes
+    tag = ",".join(sorted(formats)) + (" symbols" if symbols and "svg" in formats else "")
+    if "png" in formats:
+        from figtools import raster
+        tag += " %dpx" % (thumbnail or raster.SIZE)
+    if palettes: tag += " palettes " + ",".join(palettes) + " " + document
+    if atlas: tag += " atlas"
+    return {n: hashlib.sha256((h + "\0" + tag).encode("utf-8")).hexdigest() for (n, h) in hashes.items()}
+
+def plan(path, names=None, force=False, formats=("pdf",), symbols=False, thumbnail=None, palettes=(), atlas=False):
+    '''Returns the figures among names (all by default) that need rendering
+
+    Figures whose fingerprint and outputs match the build manifest are left
+    out unless force is set.'''
+
+    return _plan(os.path.abspath(path), names, force, formats, symbols, thumbnail, palettes, atlas)[0]
+
+def _plan(path, names, force, formats, symbols, thumbnail, palettes, atlas):
+    manifest = Manifest(os.path.dirname(path))
+    prints   = fingerprints(path)
+    prints   = _variant(prints, formats, symbols, thumbnail, palettes, prints.get("PALETTES", ""), atlas)
+    if names is None: names = [n for (n, _) in discover(path)]
+    return [n for n in names if force or not manifest.fresh(n, prints[n])], manifest, prints
+
+def workers(path, jobs=None, profile=False, formats=("pdf",), symbols=False, thumbnail=None, palettes=(), atlas=False):
+    '''Returns a pool of jobs warm workers for the figures of the script at path
+
+    Every worker starts with PyX loaded and the LaTeX preamble of the script
+    set up (see figtools.lazy.warm()). run() renders in the pool, and leaves
+    it running, when it is given as its pool (with the same arguments).'''
+
+    path = os.path.abspath(path)
+    jobs = jobs or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(jobs, multiprocessing.get_context("spawn"), _init,
+                               (path, profile, formats, symbols, thumbnail, palettes, atlas, True))
+    # The pool starts a worker for every task submitted while none is idle.
+    with _detached(): list(pool.map(_pid, range(jobs)))
+    return pool
+
+def run(path, names=None, jobs=None, force=False, profile=False, formats=("pdf",), symbols=False, thumbnail=None,
+        palettes=(), atlas=False, pool=None):
+    '''Renders the given figures (all outdated ones by default) in a process pool
+
+    Figures that another document (or an earlier build) already rendered are
+    copied from the shared figtools.registry cache unless force is set. Yields
+    one Result per figure, in order (with the figtools.profile measures of each
+    rendered figure if profile is set). Every figure is written in each of the
+    formats ("pdf", "svg", "png"), with the SVG <symbol>s of figtools.svg if
+    symbols is set and PNG thumbnails thumbnail pixels wide or high (the
+    figtools.raster default if None). The figtools.palette variants named
+    in palettes are written next to every figure, from the same drawing.
+    With atlas set, the PDF files of all the figures are then bundled in the
+    figtools.atlas of the document (which is removed otherwise, once any
+    figure has changed, since it would be out of date). pool is a pool of
+    workers() to render in instead of a new one.'''
+
+    from figtools import registry
+    path = os.path.abspath(path)
+    root = os.path.dirname(path)
+    (names, manifest, prints) = _plan(path, names, force, formats, symbols, thumbnail, palettes, atlas)
+    os.makedirs(os.path.join(root, "figures"), exist_ok=True)
+
+    keys = _variant(registry.keys(path), formats, symbols, thumbnail, palettes, fingerprints(path).get("PALETTES", ""), atlas)
+    todo = []
+    for name in names:
+        outputs = None if force else registry.restore(keys[name], name, root)
+        if outputs is None:
+            todo.append(name)
+            continue
+        manifest.update(name, prints[name], outputs)
+        yield Result(name, True, None, 0.0, outputs, None, None, True)
+    changed = bool(names)
+    names   = todo
+    if not names:
+        manifest.save()
+    else:
+        # "spawn" gives every worker its own PyX text runner (a forked one would
+        # share the pipes of the TeX process started by the parent's preamble).
+        jobs    = min(jobs or os.cpu_count() or 1, len(names))
+        context = multiprocessing.get_context("spawn")
+        try:
+            with _detached(), (nullcontext(pool) if pool else
+                               ProcessPoolExecutor(jobs, context, _init,
+                                                   (path, profile, formats, symbols, thumbnail, palettes, atlas))) as pool:
+                for result in pool.map(_render, names):
+                    if result.ok:
+                        manifest.update(result.name, prints[result.name], result.outputs)
+                        registry.store(keys[result.name], result.name, root, result.outputs)
+                    else:
+                        manifest.forget(result.name)
+                    yield result
+        finally:
+            manifest.save()
+
+    import figtools.atlas
+    if atlas: figtools.atlas.build(root, manifest.outputs(n for (n, _) in discover(path)))
+    elif changed: figtools.atlas.remove(root)
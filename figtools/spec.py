@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Figure specs: figures written as named points, polygons and styles
+#
+################################################################################
+
+# A spec has one statement per line (# starts a comment):
+#
+#   X = 2*R5                        a number
+#   A = (0, X)                      a point
+#   E = A + D                       a weighted combination of points, divided
+#   G = 3*C + 2*E                   by the sum of its weights as w_point() does
+#   S = -2*A + 3*B                  (this one is s_point(A, B, 2))
+#   polygon C D E: BASE+FILLED(RED) closed paths through the named points
+#   line B L, K D: BASE+THICK       open paths (one per comma-separated group)
+#
+# Numbers, points and styles are Python expressions over the names of the
+# spec, those of the table given with it (the constants, colours and line
+# styles of the script) and the math functions.
+#
+# A document keeps its specs as specs/NAME.spec files next to its figures.py,
+# where figtools.lazy finds them as figure NAME, titled by the first line of
+# the file when it is a comment. Their table holds the names of figures.py
+# that the spec reads (see reads()).
+
+# LIBRARIES
+import ast
+import math
+import hashlib
+import operator
+
+# CONSTANTS
+MATH   = {n: getattr(math, n) for n in ("pi", "sqrt", "sin", "cos", "tan", "atan2", "hypot", "radians", "degrees")}
+SHAPES = {"polygon": True, "line": False}   # kind -> closed
+_BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+           ast.Div: operator.truediv, ast.Pow: operator.pow}
+_UNARY  = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+
+# POINTS
+class _weighted:
+    # The sums of w*P and of w of a weighted combination of points.
+
+    def __init__(self, weight, x, y):
+        (self.weight, self.x, self.y) = (weight, x, y)
+
+    def __add__(self, other):
+        if not isinstance(other, _weighted): return NotImplemented
+        return _weighted(self.weight+other.weight, self.x+other.x, self.y+other.y)
+
+    def __sub__(self, other):
+        if not isinstance(other, _weighted): return NotImplemented
+        return _weighted(self.weight-other.weight, self.x-other.x, self.y-other.y)
+
+    def __mul__(self, k):
+        if isinstance(k, _weighted): return NotImplemented
+        return _weighted(k*self.weight, k*self.x, k*self.y)
+
+    __rmul__ = __mul__
+
+    def __neg__(self): return -1*self
+    def __pos__(self): return self
+
+    def point(self):
+        if not self.weight: raise ValueError("the weights add up to 0")
+        if self.weight == 1: return (self.x, self.y)
+        return (self.x/self.weight, self.y/self.weight)
+
+# PARSER
+def parse(source):
+    '''Returns the (line, kind, target, expression) statements of spec source
+
+    kind is "define" (target is the name defined) or one of SHAPES (target is
+    the list of vertex name lists, one per subpath). expression is the parsed
+    value or style, or None for a shape without style.'''
+
+    statements = []
+    for (number, line) in enumerate(source.split("\n"), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line: continue
+        try:
+            (kind, rest) = (line.split(None, 1) + [""])[:2]
+            if kind in SHAPES and not rest.startswith("="):
+                (vertices, _, style) = rest.partition(":")
+                target = [group.split() for group in vertices.split(",")]
+                if not all(target): raise ValueError("a path without vertices")
+                expression = ast.parse(style.strip(), mode="eval").body if style.strip() else None
+                statements.append((number, kind, target, expression))
+            else:
+                (name, equals, value) = line.partition("=")
+                if not equals or not name.strip().isidentifier(): raise ValueError("expected NAME = value, polygon or line")
+                statements.append((number, "define", name.strip(), ast.parse(value.strip(), mode="eval").body))
+        except (SyntaxError, ValueError) as e:
+            raise ValueError("spec line %d: %s (%s)" % (number, getattr(e, "msg", e), line)) from None
+    return statements
+
+def reads(statements):
+    '''Returns the sorted names that the statements read from their table
+
+    These are the names of their expressions that the spec has not defined
+    (yet), the math functions included.'''
+
+    (local, result) = (set(), set())
+    for (_, kind, target, expression) in statements:
+        if expression is not None:
+            result.update(n.id for n in ast.walk(expression) if isinstance(n, ast.Name) and n.id not in local)
+        if kind == "define": local.add(target)
+    return sorted(result)
+
+def title(source):
+    '''Returns the title of spec source: its first line, if it is a comment'''
+
+    first = source.lstrip("\n").split("\n", 1)[0].strip()
+    return first[1:].strip() if first.startswith("#") else ""
+
+# COMPILER
+def _value(node, scope):
+    # Evaluates the expression node over the names in scope (where the points
+    # are _weighted), only allowing arithmetic, pairs and calls.
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)): return node.value
+    if isinstance(node, ast.Name):
+        if node.id not in scope: raise ValueError("unknown name " + node.id)
+        return scope[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        return _BINARY[type(node.op)](_value(node.left, scope), _value(node.right, scope))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        return _UNARY[type(node.op)](_value(node.operand, scope))
+    if isinstance(node, ast.Tuple) and len(node.elts) == 2:
+        (x, y) = (_value(e, scope) for e in node.elts)
+        return _weighted(1, x, y)
+    if isinstance(node, ast.Call) and not node.keywords:
+        return _value(node.func, scope)(*[_value(a, scope) for a in node.args])
+    raise ValueError("unsupported expression " + ast.dump(node))
+
+def _geometry(statements, names):
+    # The numbers defined by the spec and the (line, path, style expression)
+    # of its shapes.
+    from pyx import path
+
+    scope  = dict(MATH, **names)
+    (local, shapes) = ({}, [])
+    for (number, kind, target, expression) in statements:
+        try:
+            if kind == "define":
+                value = _value(expression, scope)
+                # Points are kept as the point itself, weighing 1.
+                scope[target] = _weighted(1, *value.point()) if isinstance(value, _weighted) else value
+                if isinstance(value, (int, float)): local[target] = value
+                continue
+            items = []
+            for group in target:
+                points = [scope.get(v) for v in group]
+                for (v, P) in zip(group, points):
+                    if not isinstance(P, _weighted): raise ValueError("%s is not a point" % v)
+                points = [P.point() for P in points]
+                items.append(path.moveto(*points[0]))
+                items.extend(path.lineto(*P) for P in points[1:])
+                if SHAPES[kind]: items.append(path.closepath())
+            shapes.append((number, path.path(*items), expression))
+        except (ValueError, TypeError) as e:
+            raise ValueError("spec line %d: %s" % (number, e)) from None
+    return local, shapes
+
+_statements = {}    # sha256 of a spec -> (its statements, the names its definitions read)
+_geometries = {}    # (sha256 of a spec, those names and their values) -> its _geometry()
+
+def drawing(source, names):
+    '''Returns the [(path, style)] drawing list of spec source
+
+    names is the {name: value} table of the constants, colours, line styles
+    and style functions (FILLED, COLOR...) the spec uses. The paths of every
+    spec are computed once per process and values of the names its points
+    read, so the figures and watch mode re-renders that share a spec share its
+    paths; the styles are evaluated every time, over the current names.'''
+
+    sha = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    if sha not in _statements:
+        statements = parse(source)
+        _statements[sha] = (statements, reads([s for s in statements if s[1] == "define"]))
+    (statements, used) = _statements[sha]
+    # Numbers are keyed by value, anything else (a function) by identity: the
+    # key keeps it alive, so its id is never reused.
+    key = (sha, tuple((n, names.get(n, MATH.get(n))) for n in used))
+    try:
+        if key not in _geometries: _geometries[key] = _geometry(statements, names)
+        (local, shapes) = _geometries[key]
+    except TypeError:   # A name without a value key: nothing to share
+        (local, shapes) = _geometry(statements, names)
+    scope   = {**MATH, **names, **local}
+    result  = []
+    for (number, p, expression) in shapes:
+        try:
+            style = _value(expression, scope) if expression else []
+        except (ValueError, TypeError) as e:
+            raise ValueError("spec line %d: %s" % (number, e)) from None
+        result.append((p, list(style) if isinstance(style, (list, tuple)) else [style]))
+    return result
+
+def draw(file, names, source):
+    '''Writes the figure of spec source (see drawing()) as file'''
+
+    from figtools import canvas
+
+    mycanvas = canvas.canvas()
+    for (p, s) in drawing(source, names): mycanvas.stroke(p, s)
+    mycanvas.writePDFfile(file)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# SVG output: the strokes of a figure streamed as SVG elements
+#
+################################################################################
+
+# LIBRARIES
+from pyx import attr, deco, document, style, svgwriter, unit
+
+from figtools.pdf import bounds, extent, stylekey, subpaths
+
+# CONSTANTS
+SVG   = "http://www.w3.org/2000/svg"
+XLINK = "http://www.w3.org/1999/xlink"
+
+# STYLES
+def attributes(s):
+    '''Returns the attributes of the <path> elements that stroke a path with style s
+
+    as a list of dicts (two when its stroke and its fill have different
+    opacities), and the half linewidth it adds to the bounding box. They are
+    those of pyx.deco.decoratedpath.processSVG() with the attributes of the
+    <g> of the global styles moved into every path.'''
+
+    attrs = attr.mergeattrs([deco.stroked] + list(s))
+    (stroke, fill) = (None, None)
+    for a in attr.getattrs(attrs, [deco.deco]):
+        if type(a) is type(deco.stroked): stroke = a.styles
+        if type(a) is type(deco.filled):  fill   = a.styles
+    (context, registry, common) = (svgwriter.context(), svgwriter.SVGregistry(), {})
+    for a in attr.getattrs(attrs, [style.style]): a.processSVGattrs(common, None, context, registry)
+    context.fillattr = False
+    for a in stroke: a.processSVGattrs(common, None, context, registry)
+    context.fillattr = True
+    if fill is not None:
+        context.strokeattr = False
+        for a in fill: a.processSVGattrs(common, None, context, registry)
+        context.strokeattr = True
+
+    common["stroke"] = context.strokecolor
+    if fill is None:
+        elements = [dict(common)]
+        if context.strokeopacity != 1: elements[0]["opacity"] = "%f" % context.strokeopacity
+    elif context.strokeopacity != context.fillopacity:
+        elements = [dict(common, fill="none"), dict(common, stroke="none", fill=context.fillcolor)]
+        if context.strokeopacity != 1: elements[0]["opacity"] = "%f" % context.strokeopacity
+        if context.fillopacity != 1:   elements[1]["opacity"] = "%f" % context.fillopacity
+    else:
+        elements = [dict(common, fill=context.fillcolor)]
+        if context.fillopacity != 1: elements[0]["opacity"] = "%f" % context.fillopacity
+    return elements, 0.5*context.linewidth_pt
+
+def _styles(s):
+    (elements, width) = attributes(s)
+    return ["".join(' %s="%s"' % a for a in e.items()) for e in elements], width
+
+def _data(p, polygon):
+    # SVG has the y axis pointing down, so PyX writes every y as -y.
+    if polygon is None: return p.returnSVGdata()
+    return "".join("M%g %g" % (points[0][0], -points[0][1]) +
+                   "".join("L%g %g" % (x, -y) for (x, y) in points[1:]) + ("Z" if closed else "")
+                   for (points, closed) in polygon)
+
+def _paths(indent, data, elements):
+    return "".join('%s<path d="%s"%s/>\n' % (indent, data, e) for e in elements)
+
+# OUTPUT
+def options(kwargs):
+    '''Returns the page keyword arguments of a writeSVGfile() call
+
+    or None when it asks for anything but a bboxenlarge, which only PyX handles.'''
+
+    if set(kwargs) - {"page_bboxenlarge"}: return None
+    return {"bboxenlarge": kwargs["page_bboxenlarge"]} if kwargs else {}
+
+def write(entries, file=None, symbols=False, bboxenlarge=1*unit.t_pt):
+    '''Streams the (path, style, placed) entries of figtools.canvas as an SVG file
+
+    The file looks like the one pyx.canvas.canvas.writeSVGfile() writes, with
+    one <path> per stroke. With symbols set, the forms.form of the placed
+    entries become <symbol> elements, defined where they are first used (and
+    numbered in that order), and every placement a <use> of its symbol.'''
+
+    (styles, box, enlarge) = ({}, bounds(), unit.topt(bboxenlarge))
+    def compiled(s):
+        # The style lists are kept, so that their ids (the style keys) are
+        # not reused while the entries stream by.
+        key = stylekey(s)
+        if key not in styles: styles[key] = (s, _styles(s))
+        return styles[key][1]
+
+    # The bounding box (and so the viewBox) comes first in the file, so the
+    # entries are gone through twice (streamed strokes are made again).
+    link = False
+    for (p, s, placed) in entries:
+        (llx, lly, urx, ury) = extent(p, subpaths(p))
+        width = max(enlarge, compiled(s)[1])
+        box.add(llx-width, lly-width, urx+width, ury+width)
+        link = link or (symbols and placed is not None)
+    (llx, lly, urx, ury) = box.box
+
+    with document._outputstream(file, "svg") as f:
+        f.write(('<?xml version="1.0" encoding="utf-8"?>\n'
+                 '<svg xmlns="%s"%s fill="none" version="1.1" viewBox="%g %g %g %g" x="%gpt" y="%gpt" '
+                 'width="%gpt" height="%gpt" stroke-width="%f" stroke-miterlimit="%f">\n'
+                 % (SVG, ' xmlns:xlink="%s"' % XLINK if link else "", llx, -ury, urx-llx, ury-lly, llx, -ury,
+                    urx-llx, ury-lly, unit.topt(style.linewidth.normal.width), style.miterlimit.lessthan11deg.value)).encode("utf-8"))
+        defined = {}    # id(form) -> symbol id
+        for (p, s, placed) in entries:
+            if not (symbols and placed):
+                f.write(_paths(" ", _data(p, subpaths(p)), compiled(s)[0]).encode("utf-8"))
+                continue
+            (form, (((a, c), (b, d)), (e, g))) = placed
+            if id(form) not in defined:
+                defined[id(form)] = "Fm%d" % (len(defined)+1)
+                f.write((' <symbol id="%s" overflow="visible">\n%s </symbol>\n'
+                         % (defined[id(form)], _paths("  ", _data(form.path, subpaths(form.path)), compiled(form.style)[0]))).encode("utf-8"))
+            # The symbol is drawn in the y-down coordinates of SVG too.
+            f.write((' <use xlink:href="#%s" transform="matrix(%f,%f,%f,%f,%f,%f)"/>\n'
+                     % (defined[id(form)], a, -b, -c, d, e, -g)).encode("utf-8"))
+        f.write(b"</svg>\n")
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Persistent cache of the text boxes typeset by PyX's LaTeX engine
+#
+################################################################################
+
+# LIBRARIES
+import os
+import pickle
+import hashlib
+
+from pyx import text, unit
+
+from figtools.texpool import bind, engines, _finished
+
+# CONSTANTS
+VERSION   = 1
+DIRECTORY = os.environ.get("FIGTOOLS_TEXCACHE") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache")), "figtools", "tex")
+
+# CACHED ENGINE
+class CachedEngine:
+    '''PyX text engine that stores every typeset box on disk
+
+    Boxes are keyed on the preamble and on the TeX expression (plus its
+    position and attributes), so a label like \\textbf{T5} is typeset once and
+    then reused by every figure, document and run sharing that preamble.'''
+
+    def __init__(self, engine, directory=DIRECTORY):
+        self.engine    = engine
+        self.directory = directory
+        self.hits      = 0
+        self.misses    = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def preamble(self, expr, texmessages=[]):
+        self.engine.preamble(expr, texmessages)
+
+    def reset(self, reinit=False):
+        self.engine.reset(reinit)
+
+    def key(self, *args):
+        # The pickled attributes (halign.center, trafos...) are free of memory
+        # addresses, unlike their reprs.
+        preamble = [expr for (expr, _) in getattr(self.engine, "preambles", [])]
+        return hashlib.sha256(pickle.dumps((VERSION, type(self.engine).__name__, preamble, args), 4)).hexdigest()
+
+    def load(self, key):
+        try:
+            with open(os.path.join(self.directory, key), "rb") as f: return pickle.load(f)
+        except Exception:
+            return None
+
+    def store(self, key, box):
+        filename = os.path.join(self.directory, key)
+        try:
+            data = pickle.dumps(box, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        with open("%s.%d" % (filename, os.getpid()), "wb") as f: f.write(data)
+        os.replace("%s.%d" % (filename, os.getpid()), filename)
+
+    def text_pt(self, x_pt, y_pt, expr, textattrs=[], texmessages=[], fontmap=None, singlecharmode=False):
+        try:
+            key = self.key(x_pt, y_pt, expr, textattrs, fontmap, singlecharmode)
+        except Exception:
+            return self.engine.text_pt(x_pt, y_pt, expr, textattrs, texmessages, fontmap, singlecharmode)
+        box = self.load(key)
+        if box is not None:
+            self.hits += 1
+            return box
+        self.misses += 1
+        box = self.engine.text_pt(x_pt, y_pt, expr, textattrs, texmessages, fontmap, singlecharmode)
+        box.dvicanvas                # Runs TeX to the end and reads the glyphs
+        box.do_finish = _finished    # ...so the box no longer needs its runner
+        self.store(key, box)
+        return box
+
+    def text(self, x, y, *args, **kwargs):
+        return self.text_pt(unit.topt(x), unit.topt(y), *args, **kwargs)
+
+def install(directory=DIRECTORY):
+    '''Wraps PyX's default text engine (after the preamble has been set up)'''
+
+    for engine in engines():
+        if isinstance(engine, CachedEngine): return engine
+    return bind(CachedEngine(text.defaulttextengine, directory))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Warm LaTeX runner: one long-lived TeX process per figure worker
+#
+################################################################################
+
+# LIBRARIES
+import os
+
+from pyx import text, unit
+
+# AUXILIARY FUNCTIONS
+def _finished(*args, **kwargs): pass
+
+def bind(engine):
+    '''Makes engine PyX's default text engine (as text.set() would do)'''
+
+    text.defaulttextengine = engine
+    text.preamble = engine.preamble
+    text.text_pt  = engine.text_pt
+    text.text     = engine.text
+    text.reset    = engine.reset
+    return engine
+
+def engines():
+    '''Yields the default text engine and every engine it wraps'''
+
+    engine = text.defaulttextengine
+    while engine is not None:
+        yield engine
+        engine = getattr(engine, "engine", None)
+
+# WARM ENGINE
+class WarmEngine:
+    '''Restartable LaTeX engine whose TeX process survives across labels
+
+    PyX's deco.curvedtext finishes the TeX process after every label so that
+    it can read the DVI output, and the next label restarts TeX and replays
+    the whole preamble. In texipc mode TeX hands over each DVI page as soon as
+    it is typeset, so the process is started (with its preamble) only once
+    and reused by every put_text of every figure rendered by this worker.'''
+
+    def __init__(self, engine):
+        self.engine  = engine
+        self.starts  = 0
+        self.texts   = 0
+        self.current = None
+        old = engine.instance
+        engine.kwargs["texipc"] = True
+        engine.reset(reinit=True)
+        if old.state > text.STATE_START: old.do_finish()
+        self._count()
+
+    @property
+    def preambles(self): return self.engine.preambles
+
+    def _count(self):
+        if self.engine.instance is not self.current:
+            self.current = self.engine.instance
+            self.starts += 1
+
+    def preamble(self, expr, texmessages=[]):
+        self.engine.preamble(expr, texmessages)
+
+    def reset(self, reinit=False):
+        self.engine.reset(reinit)
+
+    def text_pt(self, *args, **kwargs):
+        box = self.engine.text_pt(*args, **kwargs)
+        box.do_finish = _finished    # The DVI page was read already (texipc)
+        self.texts += 1
+        self._count()
+        return box
+
+    def text(self, x, y, *args, **kwargs):
+        return self.text_pt(unit.topt(x), unit.topt(y), *args, **kwargs)
+
+    def stats(self):
+        '''Returns (pid, TeX processes started, texts typeset by them)'''
+
+        return (os.getpid(), self.starts, self.texts)
+
+def install():
+    '''Wraps PyX's default text engine (after the preamble has been set up)'''
+
+    for engine in engines():
+        if isinstance(engine, WarmEngine): return engine
+    if not isinstance(text.defaulttextengine, text.MultiEngine): return None
+    return bind(WarmEngine(text.defaulttextengine))
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Tilings: substitution rules expanded into arrays of triangles, subdivisions
+# and lattices of points
+#
+################################################################################
+
+# LIBRARIES
+import math
+
+import numpy as np
+
+from figtools.geometry import points, w_point
+
+# CONSTANTS
+QUANTUM = 1e-9  # Relative tolerance under which two edge endpoints are the same point
+
+# SUBSTITUTION RULES
+class Substitution:
+    '''A dissection of the triangle ABC declared as weighted-point substitutions
+
+    points maps the name of every new vertex to the (P, Q, Wp, Wq) arguments of
+    the w_point() that places it, where P and Q name the vertices A, B, C or an
+    earlier new vertex. children lists the vertices of each child triangle as
+    strings, so the dissection
+
+        D = w_point(B,C, 1,1)
+        E = w_point(A,C, 5,3)
+        children (D,E,B) and (D,E,C)
+
+    is Substitution({"D": ("B","C", 1,1), "E": ("A","C", 5,3)}, ["DEB", "DEC"]).'''
+
+    def __init__(self, points, children):
+        self.points   = list(points.items())
+        self.children = [tuple(child) for child in children]
+
+    def step(self, tiles):
+        '''Returns the (n*k, 3, 2) array of the children of the (n, 3, 2) tiles'''
+
+        vertex = {"A": tiles[:, 0], "B": tiles[:, 1], "C": tiles[:, 2]}
+        for (name, (P, Q, Wp, Wq)) in self.points:
+            vertex[name] = w_point(vertex[P], vertex[Q], Wp, Wq)
+        children = np.stack([np.stack([vertex[v] for v in child], axis=1) for child in self.children], axis=1)
+        return children.reshape(-1, 3, 2)
+
+    def expand(self, tile, depth, window=None, feature=0):
+        '''Returns the (n, 3, 2) array of the tiles at level depth of tile
+
+        The tiles come in the order of the equivalent recursive generator (all
+        the descendants of the first child before those of the second...).
+        Children lie inside their parent, so tiles outside the window (xmin,
+        ymin, xmax, ymax) are pruned with all their descendants and tiles
+        smaller than feature (the width or height of their bounding box) are
+        kept whole instead of being divided further.'''
+
+        tiles = points([tile])
+        k     = len(self.children)
+        for _ in range(depth):
+            if window is not None: tiles = tiles[visible(tiles, window)]
+            divide = np.ptp(tiles, axis=1).max(axis=1) >= feature
+            if not divide.any(): break
+            # Each tile is replaced in place by its k children (or by itself).
+            count = np.where(divide, k, 1)
+            start = np.cumsum(count) - count
+            result = np.empty((count.sum(), 3, 2))
+            result[start[~divide]] = tiles[~divide]
+            result[(start[divide, np.newaxis] + np.arange(k)).ravel()] = self.step(tiles[divide])
+            tiles = result
+        if window is not None: tiles = tiles[visible(tiles, window)]
+        return tiles
+
+def visible(tiles, window):
+    '''Returns the mask of the (n, 3, 2) tiles whose bounding box meets window'''
+
+    (xmin, ymin, xmax, ymax) = window
+    (low, high) = (tiles.min(axis=1), tiles.max(axis=1))
+    return (high[:, 0] >= xmin) & (high[:, 1] >= ymin) & (low[:, 0] <= xmax) & (low[:, 1] <= ymax)
+
+# RECURSIVE SUBDIVISION
+def subdivide(tile, rule, depth, window=None, feature=0):
+    '''Yields (tile, level) for tile and all its descendants down to level 0
+
+    rule(*tile) returns the list of children of a tile. The tiles come out
+    depth-first, parents before children (the drawing order of a recursive
+    subdivision), from an explicit stack that never holds more than a few
+    tiles per level, so deep subdivisions stream in bounded memory (into a
+    figtools canvas.stream(), which does not keep them either).
+
+    Children lie inside their parent, so a tile outside the window (xmin,
+    ymin, xmax, ymax) is pruned with all its descendants and a tile smaller
+    than feature (the width or height of its bounding box) is not divided.'''
+
+    stack = [(tile, depth)]
+    while stack:
+        (tile, level) = stack.pop()
+        divide = level > 0
+        if window or feature:
+            (X, Y) = ([P[0] for P in tile], [P[1] for P in tile])
+            if window and (max(X) < window[0] or max(Y) < window[1] or
+                           min(X) > window[2] or min(Y) > window[3]): continue
+            divide = divide and max(max(X)-min(X), max(Y)-min(Y)) >= feature
+        yield (tile, level)
+        if divide: stack.extend((child, level-1) for child in reversed(rule(*tile)))
+
+# EDGES
+def edges(tiles, unique=True):
+    '''Returns the (m, 2, 2) array of the sides of the (n, 3, 2) tiles
+
+    With unique set, collinear sides that overlap or touch (a side shared by
+    two tiles, or split by the vertices of its neighbours) are merged into one
+    segment, so every stretch of every line is stroked exactly once.'''
+
+    tiles = points(tiles)
+    sides = np.stack([tiles, np.roll(tiles, -1, axis=1)], axis=2).reshape(-1, 2, 2)
+    if not unique or not len(sides): return sides
+
+    # Every side lies on the line {X: N.X = c} and spans [t0, t1] along it.
+    # The direction of every side is turned so that its first non-zero
+    # component is positive, which gives collinear sides the same angle
+    # whichever way they run (the angles near 0 and near pi alike).
+    (P, Q) = (sides[:, 0], sides[:, 1])
+    D      = Q - P
+    flip   = np.where(np.abs(D[:, 0]) > QUANTUM*np.hypot(D[:, 0], D[:, 1]), D[:, 0] < 0, D[:, 1] < 0)
+    D      = np.where(flip[:, np.newaxis], -D, D)
+    angle  = np.arctan2(D[:, 1], D[:, 0])
+    U      = np.stack([np.cos(angle), np.sin(angle)], axis=-1)
+    N      = np.stack([-U[:, 1], U[:, 0]], axis=-1)
+    scale  = QUANTUM*max(np.abs(sides).max(), 1.0)
+    line   = np.stack([np.round(angle/QUANTUM), np.round(np.sum(N*P, axis=-1)/scale)], axis=-1).astype(np.int64)
+    (t0, t1) = (np.sum(U*P, axis=-1), np.sum(U*Q, axis=-1))
+    (t0, t1) = (np.minimum(t0, t1), np.maximum(t0, t1))
+
+    merged = []
+    for i in np.lexsort((t0, line[:, 1], line[:, 0])):
+        key = tuple(line[i])
+        if merged and merged[-1][0] == key and t0[i] <= merged[-1][2] + scale:
+            merged[-1][2] = max(merged[-1][2], t1[i])
+        else:
+            merged.append([key, t0[i], t1[i], i])
+    result = np.empty((len(merged), 2, 2))
+    for (k, (_, a, b, i)) in enumerate(merged):
+        (u, c) = (U[i], np.dot(N[i], P[i]))
+        result[k] = [c*N[i] + a*u, c*N[i] + b*u]
+    return result
+
+def triangles(tiles):
+    '''Returns one PyX path with a closed subpath per (3, 2) tile of the tiles array'''
+
+    from pyx import path
+    return path.path(*[item for (P, Q, R) in points(tiles).tolist()
+                       for item in (path.moveto(*P), path.lineto(*Q), path.lineto(*R), path.closepath())])
+
+def segments(sides):
+    '''Returns one PyX path with a subpath per (2, 2) side of the sides array'''
+
+    from pyx import path
+    return path.path(*[item for (P, Q) in points(sides).tolist()
+                       for item in (path.moveto(*P), path.lineto(*Q))])
+
+def dots(points):
+    '''Returns one PyX path per point, a zero-length closed subpath (a dot, with round caps)
+
+    PyX only closes a moveto+closepath subpath at the start of a path, so each
+    dot is a path of its own rather than a subpath of a shared one.'''
+
+    from pyx import path
+    return [path.path(path.moveto(*P), path.closepath()) for P in points]
+
+# LATTICES
+def lattice(O, U, V, n, halfplanes):
+    '''Returns the points O+i*U+j*V (0<i,j<n) with a*x+b*y < c for every (a,b,c) in halfplanes
+
+    Each row i only visits the range [lo, hi] of j that the halfplanes allow,
+    computed from where each of them crosses the row. That range is rounded
+    outwards, so every j in it is still tested against all the halfplanes.'''
+
+    points = []
+    for i in range(1, n):
+        P = (O[0] + i*U[0], O[1] + i*U[1])
+        lo, hi = 1, n-1
+        for (a, b, c) in halfplanes:
+            k = a*V[0] + b*V[1]     # Growth of a*x+b*y per step along V
+            r = c - a*P[0] - b*P[1]
+            if   k > 0: hi = min(hi, int(math.ceil(r/k)))
+            elif k < 0: lo = max(lo, int(math.floor(r/k)))
+            elif r <= 0: hi = 0
+        for j in range(lo, hi+1):
+            Q = (P[0] + j*V[0], P[1] + j*V[1])
+            if all(a*Q[0] + b*Q[1] < c for (a, b, c) in halfplanes): points.append(Q)
+    return points
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#
+# Watch mode: re-render the figures of a script as soon as they change
+#
+################################################################################
+
+# LIBRARIES
+import os
+import glob
+import time
+
+from figtools.lazy import definitions, discover, specs, toolkit
+from figtools.manifest import fingerprints
+from figtools.runner import plan, run, workers
+
+# CONSTANTS
+POLL = 0.1  # Seconds between two looks at the files
+
+# CHANGES
+def _stamp(path):
+    # The (file, mtime, size) of the script, of its figure specs and of the
+    # figtools modules (None while an editor is replacing one of them).
+    package = os.path.dirname(os.path.abspath(__file__))
+    try:
+        return [(f, os.stat(f).st_mtime_ns, os.stat(f).st_size)
+                for f in [path] + [f for (_, f) in specs(path)] + sorted(glob.glob(os.path.join(package, "*.py")))]
+    except FileNotFoundError:
+        return None
+
+def _generation(path):
+    # What a warm worker loads once and for all: the imports and the text
+    # setup of the script, the figtools modules and the PALETTES of the script.
+    # A change to any of them needs new workers.
+    return (tuple(definitions(path)[2]), toolkit(path), fingerprints(path).get("PALETTES", ""))
+
+# WATCH
+def watch(path, choose=None, jobs=None, formats=("pdf",), symbols=False, thumbnail=None, palettes=(), atlas=False,
+          latex=False, log=print):
+    '''Renders the figures of the script at path whenever they change, until interrupted
+
+    Every time the script (or one of its specs, or figtools) is saved, the
+    figures whose fingerprint (the source of the figure and of everything it
+    reaches, see figtools.manifest) no longer matches the build manifest are
+    rendered in a pool of warm workers (see figtools.runner.workers()), which
+    is only restarted when what it loaded has changed. choose, if given, picks
+    the figures to watch from the (name, docstring) pairs of the script. With
+    latex set, the document is then rebuilt by figtools.build.latex().'''
+
+    path = os.path.abspath(path)
+    root = os.path.dirname(path)
+    if latex:
+        from figtools import build
+        env = build.environment(root)
+    options = (formats, symbols, thumbnail, palettes, atlas)
+    (pool, generation, stamp) = (None, None, None)
+    log("Watching %s (Ctrl+C to stop)" % path)
+    try:
+        while True:
+            now = _stamp(path)
+            if now is None or now == stamp:
+                time.sleep(POLL)
+                continue
+            stamp = now
+            try:
+                current = _generation(path)
+                figures = discover(path)
+                names   = [n for (n, _) in (choose(figures) if choose else figures)]
+                names   = plan(path, names, False, *options)
+            except SyntaxError as e:
+                log("%s, line %s: %s (waiting for the next change)" % (os.path.basename(path), e.lineno, e.msg))
+                continue
+            except ValueError as e:
+                log("%s (waiting for the next change)" % e)
+                continue
+            if current != generation:
+                if pool:
+                    pool.shutdown()
+                    log("Restarting the workers: the imports, text setup, palettes or figtools changed")
+                pool       = workers(path, jobs, False, *options)
+                generation = current
+            if not names: continue
+
+            (start, failed) = (time.perf_counter(), 0)
+            for r in run(path, names, jobs, False, False, *options, pool=pool):
+                log("%-16s %s %7.2fs" % (r.name, "copy" if r.shared else "ok  " if r.ok else "FAIL", r.seconds))
+                if not r.ok:
+                    log(r.error)
+                    failed += 1
+            log("%d figures updated, %d failed in %.2fs" % (len(names)-failed, failed, time.perf_counter()-start))
+            if latex and not failed:
+                try:
+                    build.latex(root, env, log=log)
+                except RuntimeError as e:
+                    log(str(e))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if pool: pool.shutdown(cancel_futures=True)
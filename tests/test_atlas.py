@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import re
+
+import pytest
+
+pytest.importorskip("pyx")
+
+from figtools import atlas, canvas
+
+def _figure(root, name, width):
+    from pyx import path
+    mycanvas = canvas.canvas()
+    mycanvas.stroke(path.rect(0, 0, width, 1), [])
+    mycanvas.writePDFfile(os.path.join(root, "figures", name))
+    return os.path.join("figures", name + ".pdf")
+
+def _pages(data):
+    # The page objects of the PDF file data, in the order of its /Kids.
+    objects = atlas._objects(data)
+    catalog = int(atlas.REF.search(data[data.rindex(b"trailer"):].split(b"/Root", 1)[1]).group(1))
+    pages   = int(atlas.REF.search(objects[catalog].split(b"/Pages", 1)[1]).group(1))
+    kids    = objects[pages].split(b"/Kids", 1)[1].split(b"]", 1)[0]
+    return objects, [objects[int(n)] for n in atlas.REF.findall(kids)]
+
+def _contents(objects, page):
+    return atlas._split(objects[int(atlas.REF.search(page.split(b"/Contents", 1)[1]).group(1))])[1]
+
+@pytest.fixture
+def root(tmp_path):
+    os.makedirs(tmp_path / "figures")
+    return str(tmp_path)
+
+# MERGING
+def test_atlas_keeps_every_page(root):
+    files = [_figure(root, name, width) for (name, width) in (("figure000a", 1), ("figure000b", 2))]
+    book  = atlas.atlas()
+    for f in files:
+        with open(os.path.join(root, f), "rb") as data: book.add(f, data.read())
+    out = io.BytesIO()
+    book.write(out)
+    (objects, pages) = _pages(out.getvalue())
+    assert len(pages) == 2
+    for (f, page) in zip(files, pages):
+        with open(os.path.join(root, f), "rb") as data: data = data.read()
+        (own, [original]) = _pages(data)
+        assert re.search(rb"/MediaBox[^\n]*", page).group() == re.search(rb"/MediaBox[^\n]*", original).group()
+        assert _contents(objects, page) == _contents(own, original)
+        assert b"/Parent" in page
+
+def test_atlas_shares_equal_objects(root):
+    f = _figure(root, "figure000a", 1)
+    with open(os.path.join(root, f), "rb") as data: data = data.read()
+    (one, two) = (atlas.atlas(), atlas.atlas())
+    one.add("a", data)
+    for name in "ab": two.add(name, data)
+    # The second page brings its page object and nothing else.
+    assert len(two.objects) == len(one.objects) + 1
+
+# BUILD
+def test_build_writes_once_per_set_of_files(root):
+    files = [_figure(root, "figure000a", 1), _figure(root, "figure000b", 2)]
+    assert atlas.build(root, files)
+    with open(os.path.join(root, atlas.INDEX), encoding="utf-8") as f: index = f.read()
+    assert "figtools@atlas@figures/figure000a.pdf\\endcsname{1}" in index
+    assert "figtools@atlas@figures/figure000b.pdf\\endcsname{2}" in index
+    assert not atlas.build(root, files)
+    _figure(root, "figure000b", 3)
+    assert atlas.build(root, files)
+    atlas.remove(root)
+    assert not os.path.exists(os.path.join(root, atlas.PDF))
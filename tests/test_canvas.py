@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+pytest.importorskip("pyx")
+
+from pyx import path, style
+
+from figtools import canvas
+from figtools.tiling import subdivide
+
+STYLES = [[style.linewidth.thin], [style.linewidth.normal], [style.linewidth.Thick], [style.linewidth.THick],
+          [style.linewidth.THIck], [style.linewidth.THICk]]
+
+def _pinwheel(A, B, C):
+    def w(P, Q, a, b): return ((a*P[0]+b*Q[0])/(a+b), (a*P[1]+b*Q[1])/(a+b))
+    D = w(B, C, 4, 1)
+    (E, F, G) = (w(D, C, 1, 1), w(A, C, 1, 1), w(A, D, 1, 1))
+    return [(D, B, A), (E, F, D), (G, A, F), (E, F, C)]
+
+def _tiles():
+    return ((path.path(path.moveto(*P), path.lineto(*Q), path.lineto(*R), path.closepath()), STYLES[s])
+            for ((P, Q, R), s) in subdivide(((0, 0), (0, 4), (8, 0)), _pinwheel, 4))
+
+def _write(tmp_path, name, streamed, formats=("pdf", "svg", "png")):
+    mycanvas = canvas.canvas()
+    mycanvas.formats = formats
+    if streamed: mycanvas.stream(_tiles)
+    else:
+        for (p, s) in _tiles(): mycanvas.stroke(p, s)
+    mycanvas.writePDFfile(os.path.join(tmp_path, name))
+    return {f: open(os.path.join(tmp_path, name + "." + f), "rb").read() for f in formats}
+
+# STREAMS
+def test_streamed_strokes_write_the_same_files(tmp_path):
+    stroked = _write(tmp_path, "stroked", False)
+    assert b"/Fm" in stroked["pdf"]     # The repeated outlines are placed as forms
+    assert _write(tmp_path, "streamed", True) == stroked
+
+def test_streamed_strokes_are_written_through_pyx(tmp_path):
+    # A fill sends the canvas through the PyX canvas items.
+    def fill(c): c.draw(path.rect(0, 0, 1, 1), [])
+    files = []
+    for streamed in (False, True):
+        mycanvas = canvas.canvas()
+        fill(mycanvas)
+        if streamed: mycanvas.stream(_tiles)
+        else:
+            for (p, s) in _tiles(): mycanvas.stroke(p, s)
+        mycanvas.writePDFfile(os.path.join(tmp_path, str(streamed)))
+        files.append(open(os.path.join(tmp_path, "%s.pdf" % streamed), "rb").read())
+    assert files[0] == files[1]
+
+def test_profile_counts_streamed_strokes():
+    from figtools.profile import Probe
+    (stroke, draw, stream) = (canvas.canvas.stroke, canvas.canvas.draw, canvas.canvas.stream)
+    try:
+        probe = Probe()
+        probe.start()
+        canvas.canvas().stream(_tiles)
+        assert (probe.paths, probe.items) == (sum(1 for _ in _tiles()), 4*sum(1 for _ in _tiles()))
+    finally:
+        (canvas.canvas.stroke, canvas.canvas.draw, canvas.canvas.stream) = (stroke, draw, stream)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from figtools import lazy, manifest, registry
+
+SCRIPT = """from math import *
+from pyx import *
+from figtools import canvas
+
+R5    = sqrt(5.0)
+OTHER = 1
+BASE  = [style.linewidth.THick]
+
+def RED(): return color.rgb.red
+
+def figure000a():
+    '''First'''
+
+    mycanvas = canvas.canvas()
+    mycanvas.stroke(path.line(0, 0, R5, OTHER), BASE)
+    mycanvas.writePDFfile("figures/figure000a")
+
+def figure000c():
+    '''Third'''
+"""
+
+SPEC = """# Second
+
+X = 2*R5
+A = (0, 0)
+B = (X, 0)
+C = (0, X)
+polygon A B C: BASE
+"""
+
+@pytest.fixture
+def script(tmp_path):
+    os.makedirs(tmp_path / "specs")
+    with open(tmp_path / "figures.py", "w", encoding="utf-8") as f: f.write(SCRIPT)
+    with open(tmp_path / "specs" / "figure000b.spec", "w", encoding="utf-8") as f: f.write(SPEC)
+    return str(tmp_path / "figures.py")
+
+def _edit(path, old, new):
+    with open(path, encoding="utf-8") as f: source = f.read()
+    with open(path, "w", encoding="utf-8") as f: f.write(source.replace(old, new))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))   # Seen as a new version
+
+# SPECS
+def test_specs_are_listed_among_the_figures(script):
+    assert lazy.discover(script) == [("figure000a", "First"), ("figure000b", "Second"), ("figure000c", "Third")]
+
+def test_specs_reach_only_the_names_they_read(script):
+    (defs, refs, _) = lazy.definitions(script)
+    assert lazy.closure(defs, refs, "figure000b") == ["BASE", "R5", "figure000b"]
+    assert defs["figure000b"] == SPEC
+
+def test_spec_fingerprints_follow_their_names(script):
+    spec   = os.path.join(os.path.dirname(script), "specs", "figure000b.spec")
+    before = manifest.fingerprints(script)
+    key    = registry.keys(script)["figure000b"]
+    _edit(script, "OTHER = 1", "OTHER = 2")
+    after = manifest.fingerprints(script)
+    assert after["figure000b"] == before["figure000b"] and after["figure000a"] != before["figure000a"]
+    assert registry.keys(script)["figure000b"] == key
+    _edit(spec, "X = 2*R5", "X = 3*R5")
+    assert manifest.fingerprints(script)["figure000b"] != after["figure000b"]
+    _edit(script, "R5    = sqrt(5.0)", "R5    = sqrt(5.1)")
+    assert registry.keys(script)["figure000b"] != key
+
+def test_specs_are_loaded_as_figures(script, monkeypatch):
+    pytest.importorskip("pyx")
+    monkeypatch.chdir(os.path.dirname(script))
+    os.makedirs("figures")
+    lazy.figure(script, "figure000b")()
+    with open(os.path.join("figures", "figure000b.pdf"), "rb") as f: assert f.read(5) == b"%PDF-"
+
+def test_spec_errors_name_the_file(script):
+    with open(os.path.join(os.path.dirname(script), "specs", "figure000d.spec"), "w", encoding="utf-8") as f:
+        f.write("A = (0,\n")
+    with pytest.raises(ValueError, match=r"figure000d\.spec, spec line 1"): lazy.discover(script)
+
+def test_specs_cannot_shadow_functions(script):
+    with open(os.path.join(os.path.dirname(script), "specs", "figure000a.spec"), "w", encoding="utf-8") as f:
+        f.write(SPEC)
+    with pytest.raises(ValueError, match="figure000a is defined both"): lazy.discover(script)
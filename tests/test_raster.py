@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyx")
+
+from figtools.raster import coverage, outline
+
+def _rect(x0, y0, x1, y1): return np.array([(x0, y0), (x1, y0), (x1, y1), (x0, y1)], dtype=float)
+
+# SCANLINE FILL
+def test_coverage_of_pixel_aligned_square():
+    cover = coverage([_rect(1, 1, 3, 3)], 4, 4)
+    expected = np.zeros((4, 4))
+    expected[1:3, 1:3] = 1
+    assert np.allclose(cover, expected)
+
+def test_coverage_is_exact_along_x():
+    cover = coverage([_rect(0.25, 0, 2.75, 1)], 3, 1)
+    assert np.allclose(cover, [[0.75, 1, 0.75]])
+
+def test_coverage_adds_up_to_the_area():
+    triangle = np.array([(0.3, 0.2), (9.7, 1.1), (4.2, 7.9)])
+    (x, y) = triangle.T
+    area = abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))/2
+    assert coverage([triangle], 10, 8).sum() == pytest.approx(area, rel=1e-2)
+
+def test_coverage_uses_the_nonzero_rule():
+    # The overlap of two squares turning the same way is covered once...
+    cover = coverage([_rect(0, 0, 2, 2), _rect(1, 1, 3, 3)], 3, 3)
+    assert cover.sum() == pytest.approx(7)
+    assert cover.max() == pytest.approx(1)
+    # ...and a square turning the other way is a hole.
+    hole = _rect(1, 1, 2, 2)[::-1]
+    cover = coverage([_rect(0, 0, 3, 3), hole], 3, 3)
+    assert cover[1, 1] == pytest.approx(0)
+    assert cover.sum() == pytest.approx(8)
+
+def test_coverage_clips_to_the_image():
+    cover = coverage([_rect(-5, -5, 1.5, 1), _rect(1.5, 1, 9, 9)], 2, 2)
+    assert np.allclose(cover, [[1, 0.5], [0, 0.5]])
+
+def test_coverage_ignores_degenerate_polygons():
+    assert not coverage([], 2, 2).any()
+    assert not coverage([np.array([(0, 0), (1, 1)])], 2, 2).any()
+    assert not coverage([_rect(0, 1, 2, 1)], 2, 2).any()
+
+# STROKES
+def test_outline_of_butt_segment():
+    polygons = outline([(2, 5), (8, 5)], False, 2)
+    assert coverage(polygons, 10, 10).sum() == pytest.approx(12)
+
+def test_outline_round_caps():
+    (plain, round_) = (outline([(3, 5), (7, 5)], False, 2), outline([(3, 5), (7, 5)], False, 2, "round"))
+    extra = coverage(round_, 10, 10).sum() - coverage(plain, 10, 10).sum()
+    # Two half discs of radius 1, drawn as polygons of 12 sides (and sampled
+    # by 5 scanlines per row).
+    assert extra == pytest.approx(6*np.sin(2*np.pi/12), rel=3e-2)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import os
+import textwrap
+
+from figtools import registry
+
+PRELUDE = """
+from math import *
+from pyx import *
+from figtools import canvas
+
+R5   = sqrt(5.0)
+HALF = 0.5
+
+def w_point(x, y, Wx, Wy): return ((Wx*x[0]+Wy*y[0])/(Wx+Wy), (Wx*x[1]+Wy*y[1])/(Wx+Wy))
+"""
+
+FIGURE = """
+def {name}():
+    '''A segment'''
+
+    name = "figures/{name}"
+    A = (0, 0)
+    B = w_point(A, ({x}, R5), 1, 1)
+    mycanvas = canvas.canvas()
+    mycanvas.stroke(path.line(A[0], A[1], B[0], B[1]), [])
+    mycanvas.writePDFfile(name)
+"""
+
+def _script(folder, *figures, prelude=PRELUDE, extra=""):
+    os.makedirs(folder)
+    path = os.path.join(folder, "figures.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(textwrap.dedent(prelude) + extra + "".join(FIGURE.format(name=n, x=x) for (n, x) in figures))
+    return path
+
+def test_keys_ignore_the_figure_name(tmp_path):
+    one = _script(tmp_path / "one", ("figure001a", 1), ("figure001b", 2))
+    two = _script(tmp_path / "two", ("figure007c", 1), prelude=PRELUDE.replace("from math import *", "from math import sqrt"))
+    (a, b) = (registry.keys(one), registry.keys(two))
+    assert a["figure001a"] == b["figure007c"]
+    assert a["figure001a"] != a["figure001b"]
+
+def test_keys_cover_the_helpers(tmp_path):
+    one = _script(tmp_path / "one", ("figure001a", 1))
+    two = _script(tmp_path / "two", ("figure001a", 1), prelude=PRELUDE.replace("sqrt(5.0)", "sqrt(5.00001)"))
+    three = _script(tmp_path / "three", ("figure001a", 1), prelude=PRELUDE.replace("HALF = 0.5", "HALF = 0.25"))
+    (a, b, c) = (registry.keys(one), registry.keys(two), registry.keys(three))
+    assert a["figure001a"] != b["figure001a"]
+    assert a["figure001a"] == c["figure001a"]   # HALF is not used
+
+def test_keys_of_random_figures_keep_the_name(tmp_path):
+    drawn = PRELUDE + "from random import random\nSPREAD = random()\n"
+    one = _script(tmp_path / "one", ("figure001a", "SPREAD"), prelude=drawn)
+    two = _script(tmp_path / "two", ("figure002a", "SPREAD"), prelude=drawn)
+    assert registry.keys(one)["figure001a"] != registry.keys(two)["figure002a"]
+
+def test_keys_ignore_the_preamble_of_figures_without_text(tmp_path):
+    text = PRELUDE + "text.preamble(r'\\usepackage{amsmath}')\n"
+    one = _script(tmp_path / "one", ("figure001a", 1))
+    two = _script(tmp_path / "two", ("figure001a", 1), prelude=text)
+    assert registry.keys(one)["figure001a"] == registry.keys(two)["figure001a"]
+
+def test_registry_groups_equal_figures(tmp_path):
+    one = _script(tmp_path / "one", ("figure001a", 1), ("figure001b", 2))
+    two = _script(tmp_path / "two", ("figure007c", 1))
+    shared = registry.Registry([one, two])
+    assert len(shared) == 2
+    [key] = shared.lookup("figure007c")
+    assert sorted(shared.figures[key]) == [(one, "figure001a"), (two, "figure007c")]
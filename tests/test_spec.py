@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from figtools import spec
+
+SOURCE = """# A square and its diagonal
+X = 2*R
+A = (0, 0)
+C = (X, X)
+M = A + C        # The midpoint of A and C
+S = -2*A + 3*C   # s_point(A, C, 2)
+
+polygon A M C: BASE+FILLED(RED)
+line A C, M S: BASE
+line A C
+"""
+
+def _points(p):
+    # The vertices of the PyX path p, in PyX units.
+    from pyx import unit
+    return [(round(item.x_pt/unit.topt(1), 9), round(item.y_pt/unit.topt(1), 9))
+            for item in p.pathitems if hasattr(item, "x_pt")]
+
+# PARSER
+def test_parse_statements():
+    statements = spec.parse(SOURCE)
+    assert [(n, kind) for (n, kind, _, _) in statements] == [(2, "define"), (3, "define"), (4, "define"), (5, "define"),
+                                                          (6, "define"), (8, "polygon"), (9, "line"), (10, "line")]
+    assert statements[0][2] == "X"
+    assert statements[5][2] == [["A", "M", "C"]]
+    assert statements[6][2] == [["A", "C"], ["M", "S"]]
+    assert statements[7][3] is None
+
+@pytest.mark.parametrize("source, line", [("A = (0, 0)\nB = (0,\n", 2),
+                                          ("A = (0, 0)\n\npolygon : BASE\n", 3),
+                                          ("A B C\n", 1),
+                                          ("line A, : BASE\n", 1)])
+def test_parse_errors_name_the_line(source, line):
+    with pytest.raises(ValueError, match="spec line %d:" % line): spec.parse(source)
+
+def test_reads():
+    assert spec.reads(spec.parse(SOURCE)) == ["BASE", "FILLED", "R", "RED"]
+    # A name read before the spec defines it comes from the table.
+    assert spec.reads(spec.parse("Y = X\nX = 1\nZ = X")) == ["X"]
+
+def test_title():
+    assert spec.title(SOURCE) == "A square and its diagonal"
+    assert spec.title("\nA = (0, 0)\n") == ""
+
+# COMPILER
+def test_weighted_points():
+    pytest.importorskip("pyx")
+    (p, _) = spec.drawing("A = (0, 0)\nB = (4, 2)\nE = 3*A + B\nS = -2*A + 3*B\nline A E S", {})[0]
+    # w_point(A, B, 3, 1) and s_point(A, B, 2).
+    assert _points(p) == [(0, 0), (1, 0.5), (12, 6)]
+
+def test_drawing_styles():
+    pytest.importorskip("pyx")
+    names = {"R": 1, "BASE": ["base"], "RED": "red", "FILLED": lambda c: ["filled " + c]}
+    drawing = spec.drawing(SOURCE, names)
+    assert [s for (_, s) in drawing] == [["base", "filled red"], ["base"], []]
+
+@pytest.mark.parametrize("source, message", [("A = (0, 0)\npolygon A B", "spec line 2: B is not a point"),
+                                             ("X = Y", "spec line 1: unknown name Y"),
+                                             ("A = (0, 0)\nB = A - A\nline A B", "spec line 2: the weights add up to 0")])
+def test_drawing_errors_name_the_line(source, message):
+    pytest.importorskip("pyx")
+    with pytest.raises(ValueError, match=message): spec.drawing(source, {})
+
+def test_geometry_cache_keys_every_name():
+    pytest.importorskip("pyx")
+    source = "A = (0, 0)\nB = (F(1), R)\nline A B"
+    assert _points(spec.drawing(source, {"F": lambda x: x, "R": 1})[0][0]) == [(0, 0), (1, 1)]
+    assert _points(spec.drawing(source, {"F": lambda x: 2*x, "R": 1})[0][0]) == [(0, 0), (2, 1)]
+    assert _points(spec.drawing(source, {"F": abs, "R": 3})[0][0]) == [(0, 0), (1, 3)]
+    # Names the points do not read (the styles) share the paths.
+    assert spec.drawing(source, {"F": abs, "R": 3, "RED": 1})[0][0] is spec.drawing(source, {"F": abs, "R": 3})[0][0]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from figtools.tiling import Substitution, edges, lattice, subdivide
+
+def _lengths(sides): return sorted(round(float(np.hypot(*(Q - P))), 9) for (P, Q) in sides)
+
+# EDGES
+def test_edges_merge_shared_sides():
+    # Two triangles sharing the diagonal of the unit square.
+    tiles = [[(0, 0), (1, 0), (1, 1)], [(0, 0), (1, 1), (0, 1)]]
+    assert len(edges(tiles, unique=False)) == 6
+    assert _lengths(edges(tiles)) == [1, 1, 1, 1, round(math.sqrt(2), 9)]
+
+def test_edges_merge_split_sides():
+    # The base of the big triangle is split by the vertex of its neighbours.
+    tiles = [[(0, 0), (2, 0), (1, 1)], [(0, 0), (1, 0), (1, -1)], [(1, 0), (2, 0), (1, -1)]]
+    assert 2 in _lengths(edges(tiles))
+    assert len(edges(tiles)) == 6
+
+@pytest.mark.parametrize("eps", [1e-15, -1e-15])
+def test_edges_merge_sides_near_pi(eps):
+    # The second base runs back along -x with a rounding error in y, so its
+    # angle is near pi (or -pi) while that of the first one is 0.
+    sides = edges([[(0, 0), (1, 0), (0.5, 1)], [(2, eps), (1, 0), (1.5, -0.5)]])
+    assert 2 in _lengths(sides)
+    assert len(sides) == 5
+
+def test_edges_keep_parallel_sides():
+    tiles = [[(0, 0), (1, 0), (0, 1)], [(0, 1), (1, 1), (0, 2)]]
+    assert len(edges(tiles)) == len(edges(tiles, unique=False)) - 1
+
+# SUBSTITUTIONS
+def _pinwheel(A, B, C):
+    D = ((A[0]+C[0])/2, (A[1]+C[1])/2)
+    return [(D, A, B), (D, B, C)]
+
+def test_expand_follows_subdivide():
+    rule  = Substitution({"D": ("A", "C", 1, 1)}, ["DAB", "DBC"])
+    tile  = ((0.0, 0.0), (1.0, 2.0), (3.0, 0.0))
+    tiles = [t for (t, level) in subdivide(tile, _pinwheel, 4) if level == 0]
+    assert np.allclose(rule.expand(tile, 4), tiles)
+
+def test_subdivide_prunes_outside_window():
+    tile   = ((0.0, 0.0), (1.0, 2.0), (3.0, 0.0))
+    window = (0, 0, 0.5, 0.5)
+    inside = [t for (t, level) in subdivide(tile, _pinwheel, 6, window) if level == 0]
+    every  = [t for (t, level) in subdivide(tile, _pinwheel, 6) if level == 0]
+    assert 0 < len(inside) < len(every)
+    assert all(min(P[0] for P in t) <= 0.5 and min(P[1] for P in t) <= 0.5 for t in inside)
+
+# LATTICES
+def _brute(O, U, V, n, halfplanes):
+    points = [(O[0] + i*U[0] + j*V[0], O[1] + i*U[1] + j*V[1]) for i in range(1, n) for j in range(1, n)]
+    return [Q for Q in points if all(a*Q[0] + b*Q[1] < c for (a, b, c) in halfplanes)]
+
+def test_lattice_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(200):
+        O = (rng.uniform(-2, 2), rng.uniform(-2, 2))
+        U = (rng.uniform(-1, 1), rng.uniform(-1, 1))
+        V = rng.choice([(0, 1), (1, 0), (rng.uniform(-1, 1), rng.uniform(-1, 1))])
+        halfplanes = [(rng.choice([-1, 0, 1, rng.uniform(-2, 2)]), rng.choice([-1, 0, 1, rng.uniform(-2, 2)]),
+                       rng.uniform(-5, 5)) for _ in range(rng.randint(0, 4))]
+        assert lattice(O, U, V, 12, halfplanes) == _brute(O, U, V, 12, halfplanes)
+
+def test_lattice_tests_points_on_the_boundary():
+    # The points on a*x+b*y = c are left out, as the brute force leaves them.
+    assert lattice((0, 0), (1, 0), (0, 1), 5, [(0, 1, 2)]) == [(i, 1) for i in range(1, 5)]